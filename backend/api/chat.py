@@ -1,29 +1,81 @@
 # api/chat.py
-from fastapi import APIRouter, HTTPException, status
-from api.models import UserChatRequest, AssistantChatResponse, SessionClearRequest, SessionClearResponse
-from core.logic import process_user_message #, clear_user_session # Import core logic
+from contextlib import aclosing
+
+from fastapi import APIRouter, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+from api.models import UserChatRequest, AssistantChatResponse, ChatStreamToken, ChatStreamError, SessionClearRequest, SessionClearResponse
+from core.admission import chat_admission
+from core.logic import process_user_message, stream_user_message #, clear_user_session # Import core logic
 
 router = APIRouter()
 
+
+def client_address(http_request: Request) -> str:
+    # Behind a proxy, run uvicorn with --proxy-headers so this is the caller's address
+    return http_request.client.host if http_request.client else "unknown"
+
+
 @router.post("/chat", response_model=AssistantChatResponse, status_code=status.HTTP_200_OK)
-async def chat_with_assistant(request: UserChatRequest):
+async def chat_with_assistant(request: UserChatRequest, http_request: Request):
     """
     Handles conversational requests with the medical assistant.
     """
     session_id = request.session_id
     user_message = request.message
 
-    # Call the core logic that manages the conversation state
-    assistant_response_text = process_user_message(session_id, user_message)
+    await chat_admission.enter("/chat", session_id, client_address(http_request))
+    try:
+        # Call the core logic that manages the conversation state
+        assistant_response_text = await process_user_message(session_id, user_message, request.idempotency_key)
+    finally:
+        chat_admission.leave()
 
     return AssistantChatResponse(response=assistant_response_text)
 
+@router.post("/chat/stream", status_code=status.HTTP_200_OK)
+async def stream_chat_with_assistant(request: UserChatRequest, http_request: Request):
+    """
+    Same as /chat, but streams the response as newline-delimited JSON: one
+    ChatStreamToken per generated piece, then the AssistantChatResponse.
+    """
+    await chat_admission.enter("/chat/stream", request.session_id, client_address(http_request))
+    chunks = stream_user_message(request.session_id, request.message, request.idempotency_key)
+    # Wait for the first piece here, so failures before anything was generated
+    # still surface as a regular HTTP error instead of an in-stream error frame.
+    try:
+        first_chunk = await anext(chunks, "")
+    except BaseException:
+        chat_admission.leave()
+        raise
+
+    async def frames():
+        # Closing the turn when the client goes away releases its session lock
+        # and its admission slot.
+        try:
+            async with aclosing(chunks):
+                response_text = first_chunk
+                yield ChatStreamToken(token=first_chunk).model_dump_json() + "\n"
+                try:
+                    async for chunk in chunks:
+                        response_text += chunk
+                        yield ChatStreamToken(token=chunk).model_dump_json() + "\n"
+                except HTTPException as e:
+                    yield ChatStreamError(error=str(e.detail)).model_dump_json() + "\n"
+                    return
+                yield AssistantChatResponse(response=response_text).model_dump_json() + "\n"
+        finally:
+            chat_admission.leave()
+
+    return StreamingResponse(frames(), media_type="application/x-ndjson")
+
 @router.post("/chat/init_session", response_model=AssistantChatResponse, status_code=status.HTTP_200_OK)
-async def init_chat_session(request: SessionClearRequest): # Re-using SessionClearRequest for just session_id
+async def init_chat_session(request: SessionClearRequest, http_request: Request): # Re-using SessionClearRequest for just session_id
     """
     Initializes a new chat session and returns the first greeting.
     """
     session_id = request.session_id
+    # The greeting is static, so it only counts against the rate limits and never waits for a slot
+    chat_admission.check("/chat/init_session", session_id, client_address(http_request))
     # Call process_user_message_logic with an empty message to trigger initial greeting
-    initial_response = process_user_message(session_id, "")
+    initial_response = await process_user_message(session_id, "")
     return AssistantChatResponse(response=initial_response)
\ No newline at end of file
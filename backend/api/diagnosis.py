@@ -0,0 +1,28 @@
+# api/diagnosis.py
+from fastapi import APIRouter, Query, Request, status
+from fastapi.responses import StreamingResponse
+from config.settings import settings
+from core.batch import run_batch
+
+router = APIRouter()
+
+@router.post("/diagnosis/batch", status_code=status.HTTP_200_OK)
+async def diagnose_batch(
+    request: Request,
+    concurrency: int = Query(settings.BATCH_CONCURRENCY, ge=1, le=settings.BATCH_MAX_CONCURRENCY),
+    summarize: bool = Query(False, description="Also return the diagnosis summary the chat would show."),
+):
+    """
+    Bulk triage. The body is JSONL, one DiagnosisCase ({"age", "sex", "evidence"})
+    per line; the response streams one DiagnosisCaseResult per line as cases
+    finish, with `index` giving each case's position in the input.
+    """
+    # Read the whole body first: Starlette stops delivering it once the
+    # response has started, and even large batches are only a few megabytes.
+    lines = (await request.body()).decode().splitlines()
+
+    async def results():
+        async for result in run_batch(lines, concurrency, summarize):
+            yield result.model_dump_json(exclude_none=True) + "\n"
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field
-from typing import List, Optional
+from pydantic import BaseModel, Field, field_validator
+from typing import List, Literal, Optional, Union
 
 class ChatMessage(BaseModel):
     role: str
@@ -8,13 +8,47 @@ class ChatMessage(BaseModel):
 class UserChatRequest(BaseModel):
     message: str = Field(..., description="The user's message.")
     session_id: str = Field(..., description="A unique ID for the chat session.")
+    idempotency_key: Optional[str] = Field(None, max_length=128, description="Optional client-chosen ID for this message; a retry with the same key gets the stored reply instead of running the turn again.")
 
 class AssistantChatResponse(BaseModel):
     response: str = Field(..., description="The assistant's response to the user's message.")
     # Returns the latest response.
 
+class ChatStreamToken(BaseModel):
+    token: str = Field(..., description="The next piece of the assistant's response.")
+    # Sent repeatedly while the response is generated; the stream then ends with an AssistantChatResponse.
+
+class ChatStreamError(BaseModel):
+    error: str = Field(..., description="Why the response could not be completed.")
+    # Sent instead of the final AssistantChatResponse if the turn fails mid-stream.
+
 class SessionClearRequest(BaseModel):
     session_id: str = Field(..., description="The ID of the session to clear.")
 
 class SessionClearResponse(BaseModel):
-    message: str = Field(..., description="Confirmation message.")
\ No newline at end of file
+    message: str = Field(..., description="Confirmation message.")
+
+class DiagnosisCase(BaseModel):
+    # One line of a batch diagnosis request; same shape as SymptomInput in testing.py.
+    id: Optional[str] = Field(None, description="The caller's ID for the case, echoed back in its result.")
+    age: Union[int, List[int]] = Field(..., description="Age in years (a list is accepted, as in SymptomInput; its first value is used).")
+    sex: Literal["male", "female"]
+    evidence: List[str] = Field(..., min_length=1, description="IDs of the symptoms that are present.")
+
+    @field_validator("age")
+    @classmethod
+    def single_age(cls, age):
+        if isinstance(age, list):
+            if not age:
+                raise ValueError("age is empty")
+            age = age[0]
+        if not 0 <= age <= 130:
+            raise ValueError("age must be between 0 and 130")
+        return age
+
+class DiagnosisCaseResult(BaseModel):
+    index: int = Field(..., description="Position of the case in the input (results arrive in completion order).")
+    id: Optional[str] = None
+    conditions: Optional[List[dict]] = Field(None, description="Infermedica's ranked conditions for the case.")
+    summary: Optional[str] = Field(None, description="The diagnosis summary the chat would show, if requested.")
+    error: Optional[str] = Field(None, description="Why the case could not be diagnosed.")
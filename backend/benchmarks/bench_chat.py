@@ -0,0 +1,172 @@
+# benchmarks/bench_chat.py
+# Drives scripted multi-turn conversations against main:app, with Infermedica
+# and OpenAI replaced by the local stand-ins in mock_upstreams.py, and reports
+# throughput, latency percentiles per turn type and token counts. No network
+# access or API quota needed. From the backend directory:
+#   python -m benchmarks.bench_chat --sessions 200 --concurrency 50
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+
+import httpx
+import uvicorn
+
+from benchmarks.mock_upstreams import create_mock_app
+
+# (turn type, message); the empty message is the session greeting.
+SCRIPTS = [
+    [
+        ("greeting", ""),
+        ("demographics", "I'm 34, female"),
+        ("diagnosis", "I've had a headache and a fever since yesterday"),
+        ("followup", "what should I do to feel better?"),
+        ("followup", "is it contagious?"),
+        ("goodbye", "thanks, bye"),
+    ],
+    [
+        ("greeting", ""),
+        ("diagnosis", "I'm a 30 yo man. It's hard to breathe and my throat is sore."),
+        ("followup", "should I see a doctor?"),
+        ("followup", "I also have a cough now"),
+        ("goodbye", "thank you"),
+    ],
+    [
+        ("greeting", ""),
+        ("demographics", "67 year old male"),
+        ("diagnosis", "chest pain and dizziness"),
+        ("followup", "how serious is this?"),
+    ],
+]
+
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def run_session(client: httpx.AsyncClient, script: list, stream: bool, timings: dict, errors: list):
+    session_id = str(uuid.uuid4())
+    for turn_type, message in script:
+        start = time.perf_counter()
+        try:
+            if not message:
+                response = await client.post("/api/chat/init_session", json={"session_id": session_id})
+                response.raise_for_status()
+            elif stream:
+                async with client.stream("POST", "/api/chat/stream", json={"session_id": session_id, "message": message}) as response:
+                    response.raise_for_status()
+                    first_frame = True
+                    async for _ in response.aiter_lines():
+                        if first_frame:
+                            # Time to first frame is what the user perceives.
+                            timings.setdefault(f"{turn_type} (first frame)", []).append(time.perf_counter() - start)
+                            first_frame = False
+            else:
+                response = await client.post("/api/chat", json={"session_id": session_id, "message": message})
+                response.raise_for_status()
+        except httpx.HTTPError as e:
+            errors.append(f"{turn_type}: {e!r}")
+            return
+        timings.setdefault(turn_type, []).append(time.perf_counter() - start)
+
+
+async def start_server(app, port: int) -> tuple[uvicorn.Server, asyncio.Task]:
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    return server, task
+
+
+async def wait_until_ready(url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(url)).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.1)
+    raise SystemExit(f"Backend did not become ready at {url}")
+
+
+async def main(args):
+    mock_app = create_mock_app(args.infermedica_latency, args.openai_latency, args.token_latency, args.catalog_size)
+    mock_server, mock_task = await start_server(mock_app, args.mock_port)
+
+    # The backend runs in its own process, as in production, pointed at the stand-ins.
+    env = {
+        **os.environ,
+        "OPENAI_API_KEY": "bench", "INFERMEDICA_APP_ID": "bench", "INFERMEDICA_APP_KEY": "bench",
+        "INFERMEDICA_BASE_URL": f"http://127.0.0.1:{args.mock_port}/v3",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{args.mock_port}/v1",
+        # Every simulated session comes from 127.0.0.1 and sends its script back to
+        # back, so admission control would measure itself rather than the chat path
+        "CHAT_CLIENT_RATE": "1000000", "CHAT_CLIENT_BURST": "1000000",
+        "CHAT_SESSION_RATE": "1000000", "CHAT_SESSION_BURST": "1000",
+        "CHAT_MAX_CONCURRENCY": str(max(args.concurrency, 64)),
+    }
+    backend = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.app_port), "--workers", str(args.workers), "--log-level", "warning"],
+        env=env,
+    )
+    try:
+        await wait_until_ready(f"http://127.0.0.1:{args.app_port}/")
+
+        timings, errors = {}, []
+        semaphore = asyncio.Semaphore(args.concurrency)
+        limits = httpx.Limits(max_connections=args.concurrency)
+
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.app_port}", limits=limits, timeout=120) as client:
+            async def bounded(i: int):
+                async with semaphore:
+                    await run_session(client, SCRIPTS[i % len(SCRIPTS)], args.stream, timings, errors)
+
+            start = time.perf_counter()
+            await asyncio.gather(*(bounded(i) for i in range(args.sessions)))
+            elapsed = time.perf_counter() - start
+
+        report(args, timings, errors, elapsed, mock_app.state.stats)
+    finally:
+        backend.terminate()
+        backend.wait()
+        mock_server.should_exit = True
+        await mock_task
+
+
+def report(args, timings: dict, errors: list, elapsed: float, upstream: dict):
+    turns = sum(len(values) for name, values in timings.items() if "first frame" not in name)
+    print(f"{args.sessions} sessions, concurrency {args.concurrency}, {'streaming' if args.stream else 'non-streaming'}")
+    print(f"{turns} turns in {elapsed:.2f}s -> {turns / elapsed:.1f} turns/s, {args.sessions / elapsed:.1f} sessions/s")
+    print(f"{'turn type':<28}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'mean ms':>10}")
+    for name, values in sorted(timings.items()):
+        print(f"{name:<28}{len(values):>6}"
+              f"{percentile(values, 50) * 1000:>10.1f}{percentile(values, 95) * 1000:>10.1f}"
+              f"{percentile(values, 99) * 1000:>10.1f}{statistics.fmean(values) * 1000:>10.1f}")
+    print(f"upstream requests: {upstream['requests']}")
+    print(f"tokens: {upstream['prompt_tokens']} prompt ({upstream['cached_tokens']} cached), {upstream['completion_tokens']} completion "
+          f"({upstream['prompt_tokens'] / max(turns, 1):.0f} prompt tokens/turn)")
+    if errors:
+        print(f"{len(errors)} failed sessions, e.g. {errors[0]}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline load test of the /api/chat path.")
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--stream", action="store_true", help="Use /api/chat/stream and also report time to first frame.")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for the backend.")
+    parser.add_argument("--infermedica-latency", default="lognormal:150:0.4", help="fixed:MS, uniform:LO:HI or lognormal:MEDIAN_MS:SIGMA")
+    parser.add_argument("--openai-latency", default="lognormal:400:0.5", help="Time to first token, same format.")
+    parser.add_argument("--token-latency", default="fixed:15", help="Delay between streamed tokens, same format.")
+    parser.add_argument("--catalog-size", type=int, default=400)
+    parser.add_argument("--app-port", type=int, default=8101)
+    parser.add_argument("--mock-port", type=int, default=8102)
+    asyncio.run(main(parser.parse_args()))
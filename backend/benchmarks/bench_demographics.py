@@ -0,0 +1,88 @@
+# benchmarks/bench_demographics.py
+# Accuracy and per-message cost of the demographics extractor, compared with
+# the regexes extract_user_info used to run. From the backend directory:
+#   python -m benchmarks.bench_demographics
+import re
+import time
+
+from core.demographics import extract_demographics
+
+# (utterance, expected age, expected unit, expected sex)
+CORPUS = [
+    ("I'm a 20 year old female. I've been feeling dizzy and my heart is beating really fast.", 20, "year", "female"),
+    ("I'm a 30 yo man. It’s hard to breathe and my throat is sore.", 30, "year", "male"),
+    ("Everything hurts and I’m exhausted.", None, "year", None),
+    ("my age is 45 and I'm a woman", 45, "year", "female"),
+    ("I am 67 years old, male, chest pain since this morning", 67, "year", "male"),
+    ("25F, headache for 3 days", 25, "year", "female"),
+    ("30 male", 30, "year", "male"),
+    ("My son is 6 months old and has a fever of 101", 6, "month", "male"),
+    ("she is an 18-month-old girl with a rash", 18, "month", "female"),
+    ("8 week old boy, not feeding well", 2, "month", "male"),
+    ("I've had a fever for 3 days and a cough", None, "year", None),
+    ("I took 2 tablets of ibuprofen", None, "year", None),
+    ("temperature is 102 F and I feel awful", None, "year", None),
+    ("I'm 3 days into this cold", None, "year", None),
+    ("aged 52, female, back pain", 52, "year", "female"),
+    ("age: 19. guy. sore throat", 19, "year", "male"),
+    ("I'm 40", 40, "year", None),
+    ("female", None, "year", "female"),
+    ("what should I eat?", None, "year", None),
+    ("i am a 72 year old gentleman with swollen ankles", 72, "year", "male"),
+    ("I have had pain for 10 years", None, "year", None),
+    ("I'm 35 and pregnant, lots of nausea", 35, "year", None),
+    ("Hi, 28 y/o woman here, migraine again", 28, "year", "female"),
+    ("I manage a team and get headaches at work", None, "year", None),
+    ("my temperature is 99.5F", None, "year", None),
+    ("my temp is 99f", None, "year", None),
+    ("I have had this for 20m", None, "year", None),
+    ("BP 12m", None, "year", None),
+    ("i have had 2 kids, 1 son", None, "year", None),
+    ("I am 5 foot 10, male 40", None, "year", "male"),
+]
+
+_LEGACY_AGE_RE = r'my age is (\d+)|i\'m (\d+) (?:years old|yo)|i am (\d+) (?:years old|yo)|i\'m a (\d+) (?:year old|yo)|(/d+) (?:years old|yo)|\b(\d{1,3})\b'
+_LEGACY_SEX_RE = r'(male|female|man|woman|boy|girl|guy)'
+
+
+def legacy_extract(text: str):
+    """
+    The previous extract_user_info parsing, kept here as the baseline.
+    """
+    age = sex = None
+    age_match = re.search(_LEGACY_AGE_RE, text.lower())
+    if age_match:
+        age = int(age_match.group(1) or age_match.group(2) or age_match.group(3) or age_match.group(4) or age_match.group(5) or age_match.group(6))
+    sex_match = re.search(_LEGACY_SEX_RE, text.lower())
+    if sex_match:
+        sex = {"man": "male", "boy": "male", "guy": "male", "male": "male", "woman": "female", "girl": "female", "female": "female"}[sex_match.group(1)]
+    return age, "year", sex
+
+
+def current_extract(text: str):
+    demographics = extract_demographics(text)
+    return demographics.age, demographics.age_unit, demographics.sex
+
+
+def bench(name: str, extract, rounds: int = 2000):
+    failures = [
+        (text, expected, extract(text))
+        for text, *expected in CORPUS
+        if extract(text) != tuple(expected)
+    ]
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for text, *_ in CORPUS:
+            extract(text)
+    elapsed = time.perf_counter() - start
+    per_message_us = elapsed / (rounds * len(CORPUS)) * 1e6
+
+    print(f"{name:>8}: {len(CORPUS) - len(failures)}/{len(CORPUS)} correct, {per_message_us:.2f} µs/message")
+    for text, expected, got in failures:
+        print(f"          {text!r}: expected {expected}, got {got}")
+
+
+if __name__ == "__main__":
+    bench("legacy", legacy_extract)
+    bench("current", current_extract)
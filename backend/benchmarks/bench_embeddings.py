@@ -0,0 +1,77 @@
+# benchmarks/bench_embeddings.py
+# Per-message cost of the vector lookup that runs after the phrase matcher,
+# and how it changes what reaches the LLM: candidate recall (is the intended
+# symptom in the list the LLM sees), how many messages need the LLM at all,
+# and how many symptoms are matched confidently that the message doesn't report.
+# From the backend directory:
+#   python -m benchmarks.bench_embeddings --catalog-size 1500
+import argparse
+import time
+
+from benchmarks.mock_upstreams import build_catalog
+from core.embeddings import EmbeddingIndex
+from core.matching import SymptomMatcher
+
+# (message, common names of the symptoms it reports)
+CORPUS = [
+    ("I have a terrible hedache", ["Headache"]),
+    ("my throat is soar and I feel nauseus", ["Sore throat", "Nausea"]),
+    ("dizzyness and fainted", ["Dizziness", "Fainting"]),
+    ("diarea since yesterday", ["Diarrhea"]),
+    ("nose running all day", ["Runny nose"]),
+    ("I keep coughing and sneezing", ["Cough", "Sneezing"]),
+    ("I have a headache and a fever", ["Headache", "Fever"]),
+    ("swolen ankles in the evening", ["Swollen ankles"]),
+    ("chest pain and shortness of breath", ["Chest pain", "Shortness of breath"]),
+    ("I cant sleep at night, insomina", ["Insomnia"]),
+    ("really bad heartburn after meals", ["Heartburn"]),
+    ("my joints ache", ["Joint pain"]),
+    ("tingly fingers and numbnes", ["Tingling", "Numbness"]),
+    ("I feel really bad today", []),
+    ("what should I do", []),
+]
+
+
+def run(matcher: SymptomMatcher, index: EmbeddingIndex | None, top_k: int):
+    found = expected = llm_calls = wrong = 0
+    seconds = 0.0
+    for text, names in CORPUS:
+        start = time.perf_counter()
+        match = matcher.match(text, top_k=top_k)
+        if index is not None and match.residual_runs:
+            index.refine(match, matcher.names, top_k)
+        seconds += time.perf_counter() - start
+
+        needs_llm = not (match.is_conclusive or not match.candidates)
+        llm_calls += needs_llm
+        # What extraction can end up with: the confident IDs, plus the candidates if the LLM is asked.
+        reachable = {matcher.names[i] for i in match.confident_ids}
+        wrong += len(reachable - set(names))
+        if needs_llm:
+            reachable |= {name for _, name, _ in match.candidates}
+        found += len(set(names) & reachable)
+        expected += len(names)
+    return found / expected, llm_calls, wrong, seconds / len(CORPUS)
+
+
+def main(args):
+    catalog = build_catalog(args.catalog_size)
+    matcher = SymptomMatcher(catalog)
+    start = time.perf_counter()
+    index = EmbeddingIndex.build(catalog, {}, args.dim)
+    print(f"{len(catalog)} symptoms, index built in {(time.perf_counter() - start) * 1000:.0f} ms "
+          f"({index.matrix.nbytes / 1024:.0f} KiB)")
+
+    run(matcher, index, args.top_k)  # warm-up
+    for label, candidate_index in (("phrase matcher only", None), ("with vector lookup", index)):
+        recall, llm_calls, wrong, seconds = run(matcher, candidate_index, args.top_k)
+        print(f"{label:20} recall {recall:.0%}, LLM needed for {llm_calls}/{len(CORPUS)} messages, "
+              f"{wrong} wrong matches, {seconds * 1000:.3f} ms/message")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the vector lookup used before symptom extraction.")
+    parser.add_argument("--catalog-size", type=int, default=1500)
+    parser.add_argument("--dim", type=int, default=512)
+    parser.add_argument("--top-k", type=int, default=25)
+    main(parser.parse_args())
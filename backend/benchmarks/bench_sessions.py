@@ -0,0 +1,115 @@
+# benchmarks/bench_sessions.py
+# Memory per live session, and size of a stored session: the dict layout
+# sessions used to have versus the slotted Session, and its JSON versus the
+# compact form the SQLite store writes. From the backend directory:
+#   python -m benchmarks.bench_sessions --sessions 10000
+import argparse
+import json
+import random
+import tracemalloc
+
+from core.sessions import Condition, ConditionDetails, Session
+
+SYMPTOM_IDS = [f"s_{i}" for i in range(300)]
+CONDITIONS = [(f"c_{i}", f"Condition {i}") for i in range(50)]
+REPLY = "Based on what you've shared, this could be a common, mild illness. **This is a suggestion, not a diagnosis.** "
+
+
+def make_turns(rng: random.Random, count: int) -> list[tuple[str, str]]:
+    turns = []
+    for i in range(count):
+        if i % 2:
+            turns.append(("assistant", REPLY * rng.randint(1, 4)))
+        else:
+            turns.append(("patient", f"question number {rng.randint(0, 10**6)}, what should I do?"))
+    return turns
+
+
+def make_case(rng: random.Random) -> dict:
+    # Values come from parsed JSON or the LLM in the app, so build fresh
+    # strings rather than share the literals above.
+    conditions = rng.sample(CONDITIONS, 5)
+    return {
+        "age": rng.randint(18, 90),
+        "sex": "".join(rng.choice(["female", "male"])),
+        "symptoms": ["".join(s) for s in rng.sample(SYMPTOM_IDS, rng.randint(2, 6))],
+        "turns": [("".join(role), content) for role, content in make_turns(rng, rng.randint(4, 12))],
+        "conditions": [("".join(cid), name, round(rng.random(), 4)) for cid, name in conditions],
+    }
+
+
+def legacy_session(case: dict) -> dict:
+    """
+    The layout sessions had before: nested dicts, symptom names alongside the
+    IDs, and the raw Infermedica response kept whole.
+    """
+    return {
+        "age": {"value": case["age"], "unit": "year"},
+        "sex": case["sex"],
+        "symptoms": case["symptoms"],
+        "symptom_names": {symptom_id: f"Symptom {symptom_id}" for symptom_id in case["symptoms"]},
+        "chat_history": [{"role": role, "content": content} for role, content in case["turns"]],
+        "history_summary": None,
+        "is_diagnosed": True,
+        "diagnosis_data": {
+            "question": {"type": "single", "text": "Do you have a cough?", "items": [{"id": "s_0", "name": "Cough", "choices": [
+                {"id": "present", "label": "Yes"}, {"id": "absent", "label": "No"}, {"id": "unknown", "label": "Don't know"}]}]},
+            "conditions": [{"id": cid, "name": name, "common_name": name, "probability": p} for cid, name, p in case["conditions"]],
+            "extras": {},
+            "has_emergency_evidence": False,
+            "should_stop": False,
+        },
+        "condition_details": [
+            {"id": cid, "common_name": name, "severity": "moderate", "acuteness": "acute", "triage_level": "consultation", "hint": None}
+            for cid, name, _ in case["conditions"][:3]
+        ],
+        "current_state": "follow_up",
+    }
+
+
+def compact_session(case: dict) -> Session:
+    session = Session(age=case["age"], sex=case["sex"], is_diagnosed=True, current_state="follow_up")
+    session.add_symptoms(case["symptoms"])
+    for role, content in case["turns"]:
+        session.add_turn(role, content)
+    session.conditions = [Condition(cid, name, p) for cid, name, p in case["conditions"]]
+    session.condition_details = [
+        ConditionDetails(cid, name, "moderate", "acute", "consultation", None) for cid, name, _ in case["conditions"][:3]
+    ]
+    return session
+
+
+def measure(build, cases: list[dict]) -> tuple[list, int]:
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    sessions = [build(case) for case in cases]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    return sessions, allocated
+
+
+def main(args):
+    rng = random.Random(args.seed)
+    cases = [make_case(rng) for _ in range(args.sessions)]
+    # Chat messages are the same strings in both layouts; count them only once.
+    content_bytes = sum(len(content) + 49 for case in cases for _, content in case["turns"])
+
+    legacy, legacy_bytes = measure(legacy_session, cases)
+    compact, compact_bytes = measure(compact_session, cases)
+    legacy_stored = sum(len(json.dumps(s).encode()) for s in legacy)
+    compact_stored = sum(len(s.to_compact().encode()) for s in compact)
+
+    n = args.sessions
+    print(f"{n} sessions, {content_bytes / n:.0f} B/session of chat text (not counted below)")
+    print(f"in memory: legacy dict {legacy_bytes / n:7.0f} B/session, Session {compact_bytes / n:7.0f} B/session "
+          f"({1 - compact_bytes / legacy_bytes:.0%} smaller)")
+    print(f"stored:    legacy JSON {legacy_stored / n:7.0f} B/session, compact {compact_stored / n:7.0f} B/session "
+          f"({1 - compact_stored / legacy_stored:.0%} smaller)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the memory and storage footprint of session layouts.")
+    parser.add_argument("--sessions", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    main(parser.parse_args())
@@ -0,0 +1,77 @@
+# benchmarks/bench_startup.py
+# Cold-start budget check: how long a fresh worker process takes to import
+# main:app and get through the lifespan startup, and which imports dominate.
+# Exits with status 1 when over budget, so it can gate CI. From the backend directory:
+#   python -m benchmarks.bench_startup --budget 0.8
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+# Runs in a fresh interpreter each time, so nothing is already imported.
+PROBE = """
+import asyncio, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+
+async def startup():
+    async with main.lifespan(main.app):
+        pass
+
+asyncio.run(startup())
+print(imported - start, time.perf_counter() - imported)
+"""
+
+# Imports that must not happen at startup; each is deferred to first use.
+DEFERRED = ["openai", "sklearn", "numpy"]
+
+
+def run_probe(env: dict) -> tuple[float, float]:
+    output = subprocess.run([sys.executable, "-c", PROBE], env=env, capture_output=True, text=True, check=True).stdout
+    import_seconds, startup_seconds = output.split()[-2:]
+    return float(import_seconds), float(startup_seconds)
+
+
+def slowest_imports(env: dict, count: int) -> tuple[list[tuple[int, str]], set[str]]:
+    stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], env=env, capture_output=True, text=True, check=True).stderr
+    # Lines look like "import time: self [us] | cumulative | module", indented by depth;
+    # only main and what it imports directly are ranked.
+    rows = [re.match(r"import time:\s+\d+ \|\s+(\d+) \| (\s*)(\S+)", line) for line in stderr.splitlines()]
+    modules = {m.group(3) for m in rows if m}
+    top_level = [(int(m.group(1)), m.group(3)) for m in rows if m and len(m.group(2)) <= 2]
+    return sorted(top_level, reverse=True)[:count], modules
+
+
+def main(args):
+    # Startup must not need real credentials or network access.
+    env = {"OPENAI_API_KEY": "bench", "INFERMEDICA_APP_ID": "bench", "INFERMEDICA_APP_KEY": "bench", **os.environ,
+           "INFERMEDICA_BASE_URL": "http://127.0.0.1:9/v3"}
+
+    runs = [run_probe(env) for _ in range(args.runs)]
+    import_seconds = min(r[0] for r in runs)
+    startup_seconds = min(r[1] for r in runs)
+    total = import_seconds + startup_seconds
+    print(f"import main: {import_seconds * 1000:.0f} ms, lifespan startup: {startup_seconds * 1000:.0f} ms "
+          f"(best of {args.runs}), budget {args.budget * 1000:.0f} ms")
+
+    slowest, modules = slowest_imports(env, args.top)
+    print("slowest imports (cumulative):")
+    for micros, module in slowest:
+        print(f"  {micros / 1000:8.1f} ms  {module}")
+
+    eager = [name for name in DEFERRED if name in modules]
+    if eager:
+        print(f"FAIL: imported at startup but should be deferred: {', '.join(eager)}")
+    if total > args.budget:
+        print(f"FAIL: startup took {total * 1000:.0f} ms")
+    sys.exit(1 if eager or total > args.budget else 0)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check that a worker starts within the time budget.")
+    parser.add_argument("--budget", type=float, default=0.8, help="Seconds allowed for import plus lifespan startup.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="How many of the slowest imports to list.")
+    main(parser.parse_args())
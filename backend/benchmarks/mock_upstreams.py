@@ -0,0 +1,225 @@
+# benchmarks/mock_upstreams.py
+# Local stand-ins for the Infermedica and OpenAI endpoints the backend calls,
+# with configurable latency, so the chat path can be measured offline:
+#   /v3/symptoms, /v3/diagnosis, /v3/conditions, /v3/conditions/{id}
+#   /v1/chat/completions (plain and streamed)
+import asyncio
+import hashlib
+import json
+import random
+import re
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+COMMON_SYMPTOMS = [
+    "Fever", "Headache", "Cough", "Sore throat", "Runny nose", "Nasal congestion", "Fatigue", "Dizziness",
+    "Nausea", "Vomiting", "Diarrhea", "Abdominal pain", "Chest pain", "Shortness of breath", "Rapid heartbeat",
+    "Back pain", "Joint pain", "Muscle pain", "Skin rash", "Itching", "Chills", "Sweating", "Loss of appetite",
+    "Weight loss", "Constipation", "Heartburn", "Bloating", "Painful urination", "Frequent urination",
+    "Blurred vision", "Ear pain", "Toothache", "Neck pain", "Swollen ankles", "Insomnia", "Anxiety",
+    "Palpitations", "Wheezing", "Sneezing", "Hoarseness", "Numbness", "Tingling", "Fainting", "Confusion",
+]
+
+CONDITIONS = [
+    ("c_49", "Common cold", "common", "self_care"),
+    ("c_55", "Influenza", "common", "consultation"),
+    ("c_87", "Tension-type headache", "common", "self_care"),
+    ("c_10", "Migraine", "moderate", "consultation"),
+    ("c_132", "Gastroenteritis", "common", "consultation"),
+    ("c_34", "Acute bronchitis", "moderate", "consultation"),
+    ("c_230", "Pneumonia", "moderate", "consultation_24"),
+    ("c_7", "Panic attack", "moderate", "consultation"),
+    ("c_281", "Urinary tract infection", "common", "consultation"),
+    ("c_166", "Angina", "rare", "emergency"),
+]
+
+LOREM = (
+    "Based on what you've shared, this could be {name}. **This is a suggestion, not a diagnosis.** "
+    "## What it is\n- It is a common condition that usually improves with rest\n- Symptoms can vary from person to person\n"
+    "## What you can do\n- Stay hydrated and rest\n- Monitor your symptoms\n- **Seek care** if they get worse\n"
+    "Does this sound like what you're experiencing?"
+)
+
+
+class Latency:
+    """
+    A latency distribution parsed from "fixed:MS", "uniform:LO:HI" or
+    "lognormal:MEDIAN_MS:SIGMA".
+    """
+
+    def __init__(self, spec: str):
+        kind, *params = spec.split(":")
+        self.kind = kind
+        self.params = [float(p) for p in params]
+        if kind not in ("fixed", "uniform", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {spec!r}")
+
+    def sample(self) -> float:
+        if self.kind == "fixed":
+            return self.params[0] / 1000
+        if self.kind == "uniform":
+            return random.uniform(*self.params) / 1000
+        median, sigma = self.params
+        return random.lognormvariate(0, sigma) * median / 1000
+
+    async def wait(self):
+        await asyncio.sleep(self.sample())
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def build_catalog(size: int) -> list[dict]:
+    catalog = [
+        {"id": f"s_{i}", "name": name, "common_name": name, "category": "symptom"}
+        for i, name in enumerate(COMMON_SYMPTOMS)
+    ]
+    # Pad to a realistic catalog size with word-only names, like the real catalog.
+    qualifiers = ["Sudden", "Chronic", "Intermittent", "Severe", "Mild", "Recurrent", "Localized", "Radiating"]
+    sites = ["elbow", "wrist", "eyelid", "scalp", "groin", "hip", "knee", "shoulder", "jaw", "heel", "tongue", "calf"]
+    kinds = ["swelling", "stiffness", "redness", "tenderness", "weakness", "discoloration", "cramping", "burning"]
+    combos = ((q, site, kind) for kind in kinds for site in sites for q in qualifiers)
+    for i, (qualifier, site, kind) in zip(range(len(catalog), size), combos):
+        name = f"{qualifier} {site} {kind}"
+        catalog.append({"id": f"s_{i}", "name": name, "common_name": name, "category": "symptom"})
+    return catalog
+
+
+def create_mock_app(infermedica_latency: str = "lognormal:150:0.4", openai_latency: str = "lognormal:400:0.5",
+                    token_latency: str = "fixed:15", catalog_size: int = 400, interview_questions: int = 0) -> FastAPI:
+    """
+    With `interview_questions`, /diagnosis keeps asking questions (alternating
+    group_multiple and single ones) until that many symptoms have been answered.
+    """
+    app = FastAPI(title="HealthTalk upstream stand-ins")
+    app.state.infermedica_latency = Latency(infermedica_latency)
+    app.state.openai_latency = Latency(openai_latency)
+    app.state.token_latency = Latency(token_latency)
+    app.state.catalog = build_catalog(catalog_size)
+    app.state.stats = {"requests": {}, "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0}
+    app.state.prompt_prefixes = set()
+    catalog_etag = '"' + hashlib.sha1(json.dumps(app.state.catalog).encode()).hexdigest() + '"'
+
+    def cached_tokens(prompt_text: str) -> int:
+        # Like OpenAI's prompt caching: prefixes from 1024 tokens on are cached in 128-token steps.
+        cached = 0
+        for end in range(1024 * 4, len(prompt_text) + 1, 128 * 4):
+            prefix = hashlib.sha1(prompt_text[:end].encode()).digest()
+            if prefix in app.state.prompt_prefixes:
+                cached = end // 4
+            app.state.prompt_prefixes.add(prefix)
+        return cached
+
+    def count(endpoint: str):
+        app.state.stats["requests"][endpoint] = app.state.stats["requests"].get(endpoint, 0) + 1
+
+    @app.get("/v3/symptoms")
+    async def symptoms(request: Request):
+        count("symptoms")
+        await app.state.infermedica_latency.wait()
+        if request.headers.get("If-None-Match") == catalog_etag:
+            return Response(status_code=304)
+        return JSONResponse(app.state.catalog, headers={"ETag": catalog_etag})
+
+    @app.post("/v3/diagnosis")
+    async def diagnosis(request: Request):
+        count("diagnosis")
+        await app.state.infermedica_latency.wait()
+        payload = await request.json()
+        evidence = payload.get("evidence", [])
+        seed = sum(int(e["id"].split("_")[-1]) for e in evidence if e["id"].split("_")[-1].isdigit())
+        picked = [CONDITIONS[(seed + i) % len(CONDITIONS)] for i in range(3)]
+        known = {e["id"] for e in evidence}
+        answered = sum(1 for e in evidence if e.get("source") != "initial")
+        question = None
+        if answered < interview_questions:
+            unasked = [s for s in app.state.catalog if s["id"] not in known]
+            group = unasked[:3] if len(known) % 2 else unasked[:1]
+            question = {
+                "type": "group_multiple" if len(group) > 1 else "single",
+                "text": "Do you have any of the following symptoms?" if len(group) > 1 else f"Do you have {group[0]['name'].lower()}?",
+                "items": [{"id": s["id"], "name": s["name"], "choices": []} for s in group],
+                "extras": {},
+            }
+        return {
+            "conditions": [
+                {"id": cid, "name": name, "common_name": name, "probability": round(0.6 / (i + 1), 4)}
+                for i, (cid, name, _, _) in enumerate(picked)
+            ],
+            "question": question,
+            "should_stop": question is None,
+            "extras": {},
+        }
+
+    @app.get("/v3/conditions")
+    async def conditions():
+        count("conditions")
+        await app.state.infermedica_latency.wait()
+        return [{"id": cid, "name": name, "common_name": name, "prevalence": prevalence} for cid, name, prevalence, _ in CONDITIONS]
+
+    @app.get("/v3/conditions/{condition_id}")
+    async def condition(condition_id: str):
+        count("condition")
+        await app.state.infermedica_latency.wait()
+        for cid, name, prevalence, triage in CONDITIONS:
+            if cid == condition_id:
+                return {"id": cid, "name": name, "common_name": name, "prevalence": prevalence,
+                        "severity": "moderate", "acuteness": "acute", "triage_level": triage,
+                        "extras": {"hint": "Please consult a doctor."}}
+        return JSONResponse({"message": "not found"}, status_code=404)
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        count("chat.completions")
+        body = await request.json()
+        prompt_text = "".join(str(m.get("content", "")) for m in body["messages"])
+        prompt_tokens = estimate_tokens(prompt_text)
+        reply = mock_reply(body)
+        completion_tokens = estimate_tokens(reply)
+        cached = cached_tokens(prompt_text)
+        app.state.stats["prompt_tokens"] += prompt_tokens
+        app.state.stats["cached_tokens"] += cached
+        app.state.stats["completion_tokens"] += completion_tokens
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                 "total_tokens": prompt_tokens + completion_tokens, "prompt_tokens_details": {"cached_tokens": cached}}
+
+        await app.state.openai_latency.wait()
+        base = {"id": f"chatcmpl-{random.randrange(1 << 30)}", "created": int(time.time()), "model": body["model"]}
+
+        if not body.get("stream"):
+            return {**base, "object": "chat.completion", "usage": usage,
+                    "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": reply}}]}
+
+        async def events():
+            for piece in re.findall(r"\S+\s*", reply):
+                chunk = {**base, "object": "chat.completion.chunk",
+                         "choices": [{"index": 0, "finish_reason": None, "delta": {"content": piece}}]}
+                yield f"data: {json.dumps(chunk)}\n\n"
+                await app.state.token_latency.wait()
+            final = {**base, "object": "chat.completion.chunk", "choices": [{"index": 0, "finish_reason": "stop", "delta": {}}]}
+            yield f"data: {json.dumps(final)}\n\n"
+            if body.get("stream_options", {}).get("include_usage"):
+                yield f"data: {json.dumps({**base, 'object': 'chat.completion.chunk', 'choices': [], 'usage': usage})}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+def mock_reply(body: dict) -> str:
+    """
+    A plausible reply for each kind of prompt the backend sends.
+    """
+    prompt = "\n".join(str(m.get("content", "")) for m in body["messages"])
+    if "Only use symptoms from this list" in prompt:
+        listed = re.search(r"\{.*\}", prompt.split("Only use symptoms from this list", 1)[1], re.DOTALL)
+        symptom_ids = list(json.loads(listed.group(0)))[:2] if listed else []
+        return json.dumps({"symptom_ids": symptom_ids})
+    if "Summarize this conversation" in prompt:
+        return "The patient described their symptoms and received a suggested condition with self-care advice."
+    condition = re.search(r"top condition: ([^.\n]+)", prompt)
+    return LOREM.format(name=condition.group(1).strip() if condition else "a common, mild illness")
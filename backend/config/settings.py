@@ -1,7 +1,18 @@
 # config/settings.py
+from pydantic import BaseModel
 from pydantic_settings import BaseSettings, SettingsConfigDict
 import os
-from typing import List
+from typing import Dict, List, Optional
+
+
+class LLMRoute(BaseModel):
+    model: str
+    max_tokens: Optional[int] = None
+    temperature: Optional[float] = None
+    # Model used instead while the task's latency breaches latency_slo_seconds
+    fallback_model: Optional[str] = None
+    latency_slo_seconds: Optional[float] = None
+
 
 class Settings(BaseSettings):
     OPENAI_API_KEY: str
@@ -12,8 +23,114 @@ class Settings(BaseSettings):
 
     CORS_ORIGINS: List[str] = ["http://localhost:5173"]
 
-settings = Settings()
+    # Upstream endpoints; override to point at local stand-ins (see benchmarks/mock_upstreams.py)
+    INFERMEDICA_BASE_URL: str = "https://api.infermedica.com/v3"
+    OPENAI_BASE_URL: Optional[str] = None
+
+    # Upper bound on pooled connections to Infermedica per worker
+    INFERMEDICA_MAX_CONNECTIONS: int = 100
+
+    # Session storage: "memory" (per worker) or "sqlite" (shared by all workers on the host)
+    SESSION_BACKEND: str = "memory"
+    SESSION_SQLITE_PATH: str = "sessions.db"
+    SESSION_TTL_SECONDS: int = 30 * 60
+    # With sqlite, the cap is enforced every 100 saves per worker, so the table can briefly exceed it
+    SESSION_MAX_ENTRIES: int = 10000
+    # Chat requests that carry an idempotency_key: how long a retry gets the stored reply
+    IDEMPOTENCY_TTL_SECONDS: int = 5 * 60
+    IDEMPOTENCY_MAX_ENTRIES: int = 10000
+
+    # Chat history sent with follow-ups: older turns are folded into a running summary
+    HISTORY_TOKEN_BUDGET: int = 1500
+
+    # LLM routing: model and parameters per task. A task whose recent latency (p90 of
+    # the last LLM_LATENCY_WINDOW calls; time to first token for streamed tasks) is over
+    # its SLO runs on its fallback model for LLM_FALLBACK_SECONDS, then tries again.
+    LLM_ROUTES: Dict[str, LLMRoute] = {
+        "extract": LLMRoute(model="gpt-4o-mini", max_tokens=150, temperature=0.0, fallback_model="gpt-4.1-nano", latency_slo_seconds=3.0),
+        "followup": LLMRoute(model="gpt-4o-mini", max_tokens=600, temperature=0.5, fallback_model="gpt-4.1-nano", latency_slo_seconds=2.0),
+        "diagnosis_summary": LLMRoute(model="gpt-4o-mini", max_tokens=800, temperature=0.3, fallback_model="gpt-4.1-nano", latency_slo_seconds=2.0),
+        "history_summary": LLMRoute(model="gpt-4o-mini", max_tokens=300, temperature=0.2, fallback_model="gpt-4.1-nano", latency_slo_seconds=5.0),
+    }
+    LLM_LATENCY_WINDOW: int = 20
+    LLM_FALLBACK_SECONDS: float = 60.0
+    # USD per million tokens, for healthtalk_llm_cost_usd_total (models not listed aren't costed)
+    LLM_PRICES: Dict[str, Dict[str, float]] = {
+        "gpt-4o-mini": {"prompt": 0.15, "cached": 0.075, "completion": 0.60},
+        "gpt-4.1-nano": {"prompt": 0.10, "cached": 0.025, "completion": 0.40},
+    }
+
+    # LLM completion cache (diagnosis summaries); set COMPLETION_CACHE_DIR to add the on-disk tier
+    COMPLETION_CACHE_MAX_ENTRIES: int = 2000
+    COMPLETION_CACHE_DIR: str = ""
 
-# Configure OpenAI (moved here for centralized config)
-import openai
-openai.api_key = settings.OPENAI_API_KEY
\ No newline at end of file
+    # Per-call deadlines (seconds) within a chat turn, and how many top conditions to look up
+    CATALOG_DEADLINE_SECONDS: float = 10.0
+    DIAGNOSIS_DEADLINE_SECONDS: float = 15.0
+    CONDITION_DETAILS_DEADLINE_SECONDS: float = 5.0
+    CONDITION_DETAILS_TOP_N: int = 3
+
+    # Infermedica interview: questions asked before the diagnosis, unless it sets
+    # should_stop sooner (0 diagnoses from the reported symptoms alone)
+    INTERVIEW_MAX_QUESTIONS: int = 8
+
+    # Symptom catalog cache: one entry per age bucket, revalidated after the TTL
+    SYMPTOM_CATALOG_AGE_THRESHOLDS: List[int] = [1, 12, 18, 65]
+    SYMPTOM_CATALOG_TTL_SECONDS: int = 6 * 60 * 60
+    # Ages whose buckets are loaded at startup (in the background); the rest on first use
+    SYMPTOM_CATALOG_WARM_AGES: List[int] = [18, 65]
+    # Catalogs and symptom indexes written by `manage.py snapshot-catalogs`; workers map
+    # this file at startup instead of fetching, and pick up a replaced file on expiry
+    CATALOG_SNAPSHOT_PATH: str = ""
+
+    # Local symptom matching: how many catalog entries the LLM sees when it is needed
+    SYMPTOM_MATCH_TOP_K: int = 25
+    # First-pass vector lookup for words the phrase matcher leaves over: hashed character
+    # n-gram vectors, prebuilt into EMBEDDING_INDEX_DIR by `manage.py build-symptom-index`
+    # (otherwise built in memory). Lookups at or above the confident similarity count as
+    # matches; those above the candidate similarity go first in the LLM's list.
+    EMBEDDING_DIM: int = 512
+    EMBEDDING_INDEX_DIR: str = ""
+    EMBEDDING_CONFIDENT_SIMILARITY: float = 0.7
+    EMBEDDING_CANDIDATE_SIMILARITY: float = 0.45
+    # Optional JSON file of symptom ID --> extra phrases to index for it
+    SYMPTOM_SYNONYMS_PATH: str = ""
+
+    # Batch diagnosis (POST /api/diagnosis/batch, manage.py diagnose-batch): cases run in parallel
+    BATCH_CONCURRENCY: int = 8
+    BATCH_MAX_CONCURRENCY: int = 32
+
+    # Upstream resilience: timeouts per endpoint (seconds, per attempt), jittered
+    # retries, a circuit breaker per upstream and a cap on concurrent calls to each
+    # (calls wait up to UPSTREAM_QUEUE_SECONDS for a slot, then fail with a 503)
+    UPSTREAM_TIMEOUTS: Dict[str, float] = {
+        "infermedica.symptoms": 5.0,
+        "infermedica.diagnosis": 5.0,
+        "infermedica.condition": 2.0,
+        "openai.extract": 10.0,
+        "openai.history_summary": 15.0,
+        "openai.diagnosis_summary": 20.0,
+        "openai.followup": 20.0,
+    }
+    UPSTREAM_DEFAULT_TIMEOUT_SECONDS: float = 10.0
+    UPSTREAM_RETRIES: int = 2
+    UPSTREAM_RETRY_BASE_SECONDS: float = 0.2
+    BREAKER_FAILURE_THRESHOLD: int = 5
+    BREAKER_RESET_SECONDS: float = 30.0
+    INFERMEDICA_MAX_CONCURRENCY: int = 100
+    OPENAI_MAX_CONCURRENCY: int = 64
+    UPSTREAM_QUEUE_SECONDS: float = 2.0
+
+    # Chat admission control (per worker): token buckets per session and per client
+    # address (requests per second, burst), a cap on turns in flight with a bounded
+    # queue in front of it, and how many keys the buckets remember
+    CHAT_SESSION_RATE: float = 0.5
+    CHAT_SESSION_BURST: int = 5
+    CHAT_CLIENT_RATE: float = 5.0
+    CHAT_CLIENT_BURST: int = 20
+    CHAT_MAX_CONCURRENCY: int = 64
+    CHAT_MAX_QUEUE: int = 128
+    CHAT_QUEUE_SECONDS: float = 2.0
+    RATE_LIMIT_MAX_KEYS: int = 100000
+
+settings = Settings()
@@ -0,0 +1,126 @@
+# core/admission.py
+import asyncio
+import math
+import time
+from collections import OrderedDict
+
+from fastapi import HTTPException
+
+from config.settings import settings
+from core.telemetry import metrics
+
+admissions = metrics.counter("healthtalk_chat_admission_total", "Chat requests admitted or rejected by admission control, by outcome.")
+
+
+class RateLimiter:
+    """
+    Token buckets per key: each key may make `burst` requests at once and
+    `rate` per second sustained. Only the `max_keys` most recently seen keys
+    are tracked; a key that was dropped comes back with a full bucket, which
+    is what it would have refilled to anyway unless it was very recent.
+    """
+
+    def __init__(self, rate: float, burst: int, max_keys: int):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # key --> (tokens, updated_at)
+
+    def acquire(self, key: str) -> float:
+        """
+        Takes a token for `key`. Returns 0 if there was one, otherwise the
+        seconds until there will be.
+        """
+        now = time.monotonic()
+        tokens, updated_at = self._buckets.get(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated_at) * self.rate)
+        admitted = tokens >= 1
+        if admitted:
+            tokens -= 1
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return 0.0 if admitted else (1 - tokens) / self.rate
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class ChatAdmission:
+    """
+    Decides whether a chat turn may start: the per-session and per-client
+    token buckets first, then the cap on turns in flight. Past the cap,
+    requests wait in a bounded queue for up to `queue_seconds`; a full queue
+    or a wait that runs out is shed with a 503 instead of adding to
+    everyone's latency.
+
+    Open circuit breakers are not checked here, since which upstreams a turn
+    needs depends on where the conversation is (and the symptom catalog has a
+    stale copy to fall back on). A turn that does need one fails fast at that
+    call, with a 503 and a Retry-After from core/resilience.py.
+
+    All of it is per worker: the limits scale with the number of workers.
+    """
+
+    def __init__(self, max_concurrency: int, max_queue: int, queue_seconds: float):
+        self.max_queue = max_queue
+        self.queue_seconds = queue_seconds
+        self.session_limiter = RateLimiter(settings.CHAT_SESSION_RATE, settings.CHAT_SESSION_BURST, settings.RATE_LIMIT_MAX_KEYS)
+        self.client_limiter = RateLimiter(settings.CHAT_CLIENT_RATE, settings.CHAT_CLIENT_BURST, settings.RATE_LIMIT_MAX_KEYS)
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self.active = 0
+        self.waiting = 0
+
+    def _reject(self, route: str, outcome: str, status_code: int, detail: str, retry_after: float):
+        admissions.inc(route=route, outcome=outcome)
+        raise HTTPException(status_code=status_code, detail=detail, headers={"Retry-After": str(max(math.ceil(retry_after), 1))})
+
+    def _limit(self, route: str, session_id: str, client: str):
+        retry_after = self.session_limiter.acquire(session_id)
+        if retry_after:
+            self._reject(route, "session_rate_limited", 429, "Too many messages for this session, please slow down", retry_after)
+        retry_after = self.client_limiter.acquire(client)
+        if retry_after:
+            self._reject(route, "client_rate_limited", 429, "Too many requests, please slow down", retry_after)
+
+    async def enter(self, route: str, session_id: str, client: str):
+        """
+        Applies the rate limits, then waits for a slot, or raises a 429/503
+        HTTPException with a Retry-After header. Every successful `enter` must
+        be paired with a `leave`.
+        """
+        self._limit(route, session_id, client)
+        if self._slots.locked():
+            if self.waiting >= self.max_queue:
+                self._reject(route, "queue_full", 503, "The assistant is busy, please try again shortly", self.queue_seconds)
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.queue_seconds)
+            except asyncio.TimeoutError:
+                self._reject(route, "queue_timeout", 503, "The assistant is busy, please try again shortly", self.queue_seconds)
+            finally:
+                self.waiting -= 1
+        else:
+            await self._slots.acquire()
+        self.active += 1
+        admissions.inc(route=route, outcome="admitted")
+
+    def check(self, route: str, session_id: str, client: str):
+        """
+        Rate limits only, for requests that need no slot (the static greeting):
+        raises a 429 HTTPException with a Retry-After header, or admits.
+        """
+        self._limit(route, session_id, client)
+        admissions.inc(route=route, outcome="admitted")
+
+    def leave(self):
+        self.active -= 1
+        self._slots.release()
+
+
+chat_admission = ChatAdmission(
+    max_concurrency=settings.CHAT_MAX_CONCURRENCY,
+    max_queue=settings.CHAT_MAX_QUEUE,
+    queue_seconds=settings.CHAT_QUEUE_SECONDS,
+)
@@ -0,0 +1,99 @@
+# core/batch.py
+import asyncio
+import json
+import logging
+from collections import OrderedDict
+
+from fastapi import HTTPException
+from pydantic import ValidationError
+
+from api.models import DiagnosisCase, DiagnosisCaseResult
+from core.logic import get_diagnosis, summarize_diagnosis
+
+logger = logging.getLogger(__name__)
+
+MAX_SHARED_DIAGNOSES = 1024  # finished diagnoses kept per batch for repeated cases
+
+
+async def diagnose_case(index: int, line: str, diagnoses: dict, summarize: bool) -> DiagnosisCaseResult:
+    try:
+        case = DiagnosisCase.model_validate_json(line)
+    except ValidationError as e:
+        case_id = None
+        try:
+            case_id = json.loads(line).get("id")
+        except (ValueError, AttributeError):
+            pass
+        return DiagnosisCaseResult(index=index, id=case_id, error=f"Invalid case: {e.errors()[0]['msg']}")
+
+    # Historical case sets repeat a lot; identical cases in one batch share a diagnosis.
+    key = (case.age, case.sex, tuple(sorted(set(case.evidence))))
+    task = diagnoses.get(key)
+    if task is None:
+        task = diagnoses[key] = asyncio.ensure_future(get_diagnosis({"value": case.age, "unit": "year"}, case.sex, list(key[2])))
+        forget_finished(diagnoses)
+    else:
+        diagnoses.move_to_end(key)
+
+    try:
+        diagnosis = await asyncio.shield(task)
+        summary = None
+        if summarize and diagnosis.get("conditions"):
+            summary = "".join([chunk async for chunk in summarize_diagnosis(diagnosis)])
+    except Exception as e:
+        # A failed diagnosis isn't shared: a later identical case tries again
+        if task.done() and (task.cancelled() or task.exception() is not None) and diagnoses.get(key) is task:
+            del diagnoses[key]
+        if isinstance(e, HTTPException):
+            return DiagnosisCaseResult(index=index, id=case.id, error=str(e.detail))
+        logger.exception("Batch case %s failed", index)
+        return DiagnosisCaseResult(index=index, id=case.id, error=f"Diagnosis failed: {type(e).__name__}")
+    return DiagnosisCaseResult(index=index, id=case.id, conditions=diagnosis.get("conditions", []), summary=summary)
+
+
+def forget_finished(diagnoses: OrderedDict):
+    """
+    Drops the least recently used finished diagnoses beyond
+    MAX_SHARED_DIAGNOSES; ones still in flight (at most one per running case)
+    are kept.
+    """
+    excess = len(diagnoses) - MAX_SHARED_DIAGNOSES
+    for key, task in list(diagnoses.items()):
+        if excess <= 0:
+            break
+        if task.done():
+            del diagnoses[key]
+            excess -= 1
+
+
+async def run_batch(lines, concurrency: int, summarize: bool = False):
+    """
+    Diagnoses each JSONL case in `lines` (blank lines are skipped), at most
+    `concurrency` at a time, and yields a DiagnosisCaseResult per case as soon
+    as it is done. Lines are read only as fast as cases finish, so a file can
+    be passed in directly, however large.
+    Summaries go through the completion cache, so repeated conditions cost one
+    LLM call per batch at most.
+    """
+    diagnoses = OrderedDict()  # case key --> task with its Infermedica diagnosis, least recently used first
+    pending = set()
+    index = 0
+    try:
+        for line in lines:
+            if not line.strip():
+                continue
+            if len(pending) >= concurrency:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+            pending.add(asyncio.ensure_future(diagnose_case(index, line, diagnoses, summarize)))
+            index += 1
+
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    finally:
+        # The client went away or the batch failed: stop the remaining work.
+        for task in pending | set(diagnoses.values()):
+            task.cancel()
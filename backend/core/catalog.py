@@ -0,0 +1,161 @@
+# core/catalog.py
+import asyncio
+import logging
+import time
+
+from fastapi import HTTPException
+
+from config.settings import settings
+from core.clients import infermedica_client
+from core.resilience import infermedica_upstream
+from core.singleflight import SingleFlight
+from core.snapshot import current_snapshot
+from core.telemetry import span
+
+logger = logging.getLogger(__name__)
+
+
+class SymptomCatalogCache:
+    """
+    Caches the Infermedica /v3/symptoms catalog per age bucket.
+
+    Infermedica only changes the catalog at a few age thresholds, so every age
+    inside a bucket shares one entry. Entries are served from memory until the
+    TTL runs out, then revalidated with the stored ETag (a 304 just extends the
+    entry) and replaced only when the catalog actually changed.
+
+    With a catalog snapshot configured (see core/snapshot.py), entries come
+    from the snapshot first: a worker starts with every bucket loaded, and an
+    expired entry is replaced from a newer snapshot without a request. Only
+    when the snapshot is itself older than the TTL is Infermedica asked,
+    with the snapshot's ETag.
+    """
+
+    def __init__(self, age_thresholds: list[int], ttl_seconds: int):
+        self.age_thresholds = sorted(age_thresholds)
+        self.ttl_seconds = ttl_seconds
+        self._entries = {}  # bucket age --> {"data", "etag", "fetched_at"}
+        self._flights = SingleFlight()  # one refresh per bucket at a time, shared by its callers
+        self.metrics = {"hits": 0, "misses": 0, "refreshes": 0, "revalidations": 0, "errors": 0, "snapshot_loads": 0}
+
+    def bucket_for_age(self, age: int) -> int:
+        """
+        Returns the representative age of the bucket `age` falls into.
+        """
+        bucket = self.age_thresholds[0]
+        for threshold in self.age_thresholds:
+            if age >= threshold:
+                bucket = threshold
+        return bucket
+
+    async def get(self, age: int) -> list[dict]:
+        bucket = self.bucket_for_age(age)
+        entry = self._entries.get(bucket)
+
+        if entry is not None and time.monotonic() - entry["fetched_at"] < self.ttl_seconds:
+            self.metrics["hits"] += 1
+            return entry["data"]
+
+        if entry is None:
+            self.metrics["misses"] += 1
+        # Everyone asking for this bucket while it is being fetched waits for
+        # the same request, so a cold cache costs Infermedica one call per bucket.
+        return await self._flights.do(bucket, lambda: self._refresh(bucket, entry))
+
+    def load_snapshot(self):
+        """
+        Loads every bucket the current snapshot has, without any network access.
+        """
+        snapshot = current_snapshot()
+        if snapshot is not None:
+            for bucket in snapshot.buckets:
+                if bucket in self.age_thresholds:
+                    self._from_snapshot(bucket, self._entries.get(bucket))
+
+    def _from_snapshot(self, bucket: int, entry: dict | None) -> dict | None:
+        """
+        Replaces the bucket's entry with the snapshot's. Returns the new
+        entry, or None if the snapshot has nothing newer.
+        """
+        snapshot = current_snapshot()
+        if snapshot is None:
+            return None
+        fetched_at = time.monotonic() - max(time.time() - snapshot.created_at, 0.0)
+        if entry is not None and entry.get("snapshot") == snapshot.version:
+            if fetched_at <= entry["fetched_at"]:
+                return None
+            # The same catalogs, snapshotted again: as good as a 304.
+            entry["fetched_at"] = fetched_at
+            return entry
+
+        loaded = snapshot.symptoms(bucket)
+        if loaded is None:
+            return None
+        data, etag = loaded
+        entry = {"data": data, "etag": etag, "fetched_at": fetched_at, "snapshot": snapshot.version}
+        self._entries[bucket] = entry
+        self.metrics["snapshot_loads"] += 1
+        return entry
+
+    async def warm_up(self, ages: list[int] | None = None):
+        """
+        Loads the buckets of the given ages (every bucket by default) so the
+        first user messages don't pay for the fetch.
+        """
+        buckets = sorted({self.bucket_for_age(age) for age in ages}) if ages is not None else self.age_thresholds
+        results = await asyncio.gather(*(self.get(bucket) for bucket in buckets), return_exceptions=True)
+        for bucket, result in zip(buckets, results):
+            if isinstance(result, HTTPException):
+                logger.warning("Symptom catalog warm-up failed for age %s: %s", bucket, result.detail)
+
+    async def _refresh(self, bucket: int, entry: dict | None) -> list[dict]:
+        snapshot_entry = self._from_snapshot(bucket, entry)
+        if snapshot_entry is not None:
+            entry = snapshot_entry
+            if time.monotonic() - entry["fetched_at"] < self.ttl_seconds:
+                return entry["data"]
+
+        headers = {}
+        if entry is not None and entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+
+        try:
+            with span("infermedica.symptoms"):
+                response = await infermedica_upstream.call(
+                    "infermedica.symptoms",
+                    lambda timeout: infermedica_client().get("/symptoms", params={"age.value": bucket}, headers=headers, timeout=timeout),
+                    idempotent=True,
+                )
+        except HTTPException as e:
+            return self._fail(bucket, entry, e.detail, status_code=e.status_code)
+
+        if response.status_code == 304 and entry is not None:
+            self.metrics["revalidations"] += 1
+            entry["fetched_at"] = time.monotonic()
+            return entry["data"]
+
+        if response.status_code != 200:
+            return self._fail(bucket, entry, f"{response.status_code} - {response.text}", status_code=response.status_code)
+
+        self.metrics["refreshes"] += 1
+        data = response.json()
+        self._entries[bucket] = {
+            "data": data,
+            "etag": response.headers.get("ETag"),
+            "fetched_at": time.monotonic(),
+        }
+        return data
+
+    def _fail(self, bucket: int, entry: dict | None, reason: str, status_code: int) -> list[dict]:
+        self.metrics["errors"] += 1
+        logger.error("Error fetching symptoms for age %s: %s", bucket, reason)
+        if entry is not None:
+            # A stale catalog is still far better than failing the user's turn.
+            return entry["data"]
+        raise HTTPException(status_code=status_code, detail="Failed to fetch symptoms list from Infermedica")
+
+
+symptom_catalog = SymptomCatalogCache(
+    age_thresholds=settings.SYMPTOM_CATALOG_AGE_THRESHOLDS,
+    ttl_seconds=settings.SYMPTOM_CATALOG_TTL_SECONDS,
+)
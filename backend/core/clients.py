@@ -0,0 +1,48 @@
+# core/clients.py
+import httpx
+
+from config.settings import settings
+
+# Shared, connection-pooled clients, created on first use (once per worker) and
+# closed by the FastAPI lifespan handler. The openai package takes longer to
+# import than the rest of the app together, so it is only imported then.
+_infermedica_client = None
+_openai_client = None
+
+
+def infermedica_client() -> httpx.AsyncClient:
+    global _infermedica_client
+    if _infermedica_client is None:
+        _infermedica_client = httpx.AsyncClient(
+            base_url=settings.INFERMEDICA_BASE_URL,
+            headers={
+                "App-Id": settings.INFERMEDICA_APP_ID,
+                "App-Key": settings.INFERMEDICA_APP_KEY,
+                "Content-Type": "application/json",
+            },
+            limits=httpx.Limits(
+                max_connections=settings.INFERMEDICA_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.INFERMEDICA_MAX_CONNECTIONS,
+            ),
+        )
+    return _infermedica_client
+
+
+def openai_client():
+    global _openai_client
+    if _openai_client is None:
+        from openai import AsyncOpenAI
+
+        # Retries are handled by core/resilience.py, with the circuit breaker in the loop
+        _openai_client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY, base_url=settings.OPENAI_BASE_URL, max_retries=0)
+    return _openai_client
+
+
+async def close_clients():
+    global _infermedica_client, _openai_client
+    if _infermedica_client is not None:
+        await _infermedica_client.aclose()
+        _infermedica_client = None
+    if _openai_client is not None:
+        await _openai_client.close()
+        _openai_client = None
@@ -0,0 +1,98 @@
+# core/completion_cache.py
+import hashlib
+import json
+import os
+import re
+import tempfile
+from collections import OrderedDict
+
+from config.settings import settings
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def completion_key(model: str, messages: list[dict]) -> str:
+    """
+    Content address of a completion request: the model plus its messages with
+    whitespace collapsed, so indentation differences in prompt templates don't
+    split the cache.
+    """
+    normalized = [
+        {"role": msg["role"], "content": _WHITESPACE_RE.sub(" ", msg["content"]).strip()}
+        for msg in messages
+    ]
+    payload = json.dumps({"model": model, "messages": normalized}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CompletionCache:
+    """
+    Two-tier cache of LLM completions keyed by `completion_key`.
+
+    The in-memory tier is an LRU bounded to `max_entries`. The optional disk
+    tier (one JSON file per key under `disk_dir`) survives restarts and is
+    shared by every worker on the host, which is what `manage.py
+    warm-summaries` fills ahead of time.
+    """
+
+    def __init__(self, max_entries: int, disk_dir: str | None = None):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self._memory = OrderedDict()  # key --> completion text
+        self.metrics = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0}
+
+    def get(self, key: str) -> str | None:
+        text = self._memory.get(key)
+        if text is not None:
+            self._memory.move_to_end(key)
+            self.metrics["memory_hits"] += 1
+            return text
+
+        text = self._read_disk(key)
+        if text is not None:
+            self._remember(key, text)
+            self.metrics["disk_hits"] += 1
+            return text
+
+        self.metrics["misses"] += 1
+        return None
+
+    def set(self, key: str, text: str):
+        self._remember(key, text)
+        self._write_disk(key, text)
+        self.metrics["stores"] += 1
+
+    def _remember(self, key: str, text: str):
+        self._memory[key] = text
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], f"{key}.json")
+
+    def _read_disk(self, key: str) -> str | None:
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                return json.load(f)["text"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _write_disk(self, key: str, text: str):
+        if not self.disk_dir:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temp file and rename, so readers never see a partial entry.
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"text": text}, f)
+        os.replace(tmp_path, path)
+
+
+completion_cache = CompletionCache(
+    max_entries=settings.COMPLETION_CACHE_MAX_ENTRIES,
+    disk_dir=settings.COMPLETION_CACHE_DIR or None,
+)
@@ -0,0 +1,112 @@
+# core/demographics.py
+import re
+from dataclasses import dataclass
+
+SEX_WORDS = {
+    "male": "male", "man": "male", "boy": "male", "guy": "male", "gentleman": "male", "son": "male", "m": "male",
+    "female": "female", "woman": "female", "girl": "female", "lady": "female", "daughter": "female", "f": "female",
+}
+
+# Not the tail of a decimal ("99.5") or of a height ("5'10", "5 foot 10")
+_NUM = r"(?<![.\d'\"])(?<!foot )(?<!feet )(?<!ft )(\d{1,3})"
+_UNIT = r"(years?|yrs?|months?|mos?|weeks?|wks?)"
+_SEX = r"(male|female|man|woman|boy|girl|guy|gentleman|lady)"
+# Kin words only say something about the patient next to an age ("my son is
+# 6 months old"), not in passing ("2 kids, 1 son")
+_KIN = r"(son|daughter)"
+# Units that make a number after "I'm" a measurement rather than an age
+_MEASURE = r"%|°|degrees?|days?|hours?|hrs?|minutes?|times?|kg|lbs?|pounds?|cm|mg|foot|feet|ft|inch(?:es)?|'|\"|weeks?|months?|years? (?!old)"
+
+# Every way of stating an age or sex we recognize, as one alternation scanned
+# once per message. Each alternative carries its own numbered groups; the
+# tables below say which group holds the number, unit and sex word.
+_PATTERNS = [
+    # "6 months old", "20 year old", "a 35-year-old"
+    (rf"\b{_NUM}[\s-]*{_UNIT}[\s-]*old\b", "num", "unit"),
+    # "30 yo", "30 y/o", "30yo"
+    (rf"\b{_NUM}\s*(?:yo|y/o|y\.o\.)(?![a-z])", "num"),
+    # "my age is 30", "aged 30", "age: 30"
+    (rf"\b(?:my age is|age is|aged|age)\s*:?\s*{_NUM}\b", "num"),
+    # "30 male", "25, female", "25f", "30M"
+    (rf"\b{_NUM}\s*,?\s*(?:and\s+|a\s+)?{_SEX}\b", "num", "sex"),
+    # The compact "25f" only opens the message or follows a greeting or "I'm":
+    # elsewhere it is a temperature ("99.5F", "temp is 99f"), a duration
+    # ("for 20m") or a reading ("BP 12m")
+    (r"(?:^\W*|\b(?:hi|hello|hey|i'?m|i am)\W+)(\d{1,2})([mf])\b", "num", "sex"),
+    # "I'm 25", "i am 25", unless a duration or measurement follows ("I'm 3 days into this")
+    (rf"\b(?:i'?m|i am)\s+(?:a\s+|an\s+)?{_NUM}\b(?!\s*(?:{_MEASURE}))", "num"),
+    # "my son is 6 months old": the age itself is read by the patterns above
+    (rf"\b{_KIN}(?=\s+(?:is|who is|aged)\s+(?:a\s+|an\s+)?\d)", "sex"),
+    # A sex word on its own
+    (rf"\b{_SEX}\b", "sex"),
+]
+
+
+def _compile():
+    parts = []
+    roles = []  # per group index (1-based): "num", "unit" or "sex"
+    for pattern, *group_roles in _PATTERNS:
+        parts.append(f"(?:{pattern})")
+        roles.extend(group_roles)
+    return re.compile("|".join(parts)), roles
+
+
+_DEMOGRAPHICS_RE, _GROUP_ROLES = _compile()
+
+_UNIT_MONTHS = {"y": 12, "m": 1, "w": 0}
+
+
+@dataclass(slots=True)
+class Demographics:
+    age: int | None = None
+    age_unit: str = "year"  # "year" or "month", as Infermedica expects
+    sex: str | None = None
+
+
+def extract_demographics(text: str) -> Demographics:
+    """
+    Finds the first stated age and sex in `text` in a single regex scan.
+
+    Ages under two years given in months or weeks are kept in months, since
+    Infermedica accepts {"unit": "month"}; a bare number is never taken as an
+    age, so "fever for 3 days" doesn't set one.
+    """
+    result = Demographics()
+    for match in _DEMOGRAPHICS_RE.finditer(text.lower().replace("’", "'")):
+        num = unit = sex = None
+        for role, value in zip(_GROUP_ROLES, match.groups()):
+            if value is None:
+                continue
+            if role == "num":
+                num = int(value)
+            elif role == "unit":
+                unit = value
+            else:
+                sex = SEX_WORDS[value]
+
+        if num is not None and result.age is None:
+            months_per_unit = _UNIT_MONTHS[unit[0]] if unit else 12
+            if months_per_unit == 12 and 0 < num <= 120:
+                result.age, result.age_unit = num, "year"
+            elif months_per_unit == 1 and num < 24:
+                result.age, result.age_unit = num, "month"
+            elif months_per_unit == 1 and num <= 1440:
+                result.age, result.age_unit = num // 12, "year"
+            elif months_per_unit == 0 and num <= 104:
+                result.age, result.age_unit = num // 4, "month"
+
+        if sex is not None and result.sex is None:
+            result.sex = sex
+
+        if result.age is not None and result.sex is not None:
+            break
+    return result
+
+
+def age_in_years(age: int, unit: str) -> int:
+    """
+    Converts an age in the given unit ("year" or "month") to whole years.
+    """
+    if unit == "month":
+        return age // 12
+    return age
@@ -0,0 +1,227 @@
+# core/embeddings.py
+# Vector index over the symptom catalog, used as a first pass before the
+# LLM: words the phrase matcher couldn't place (misspellings, word forms it
+# doesn't stem, user-contributed synonyms) are looked up by cosine similarity
+# of hashed character n-gram vectors. numpy is imported with this module, which
+# is only loaded on first use so that workers start without it.
+import hashlib
+import json
+import os
+import tempfile
+import zlib
+
+import numpy as np
+
+from config.settings import settings
+from core.matching import MatchResult, tokenize
+from core.snapshot import current_snapshot
+
+NGRAM_SIZES = (2, 3)  # short grams keep misspellings ("hedache") close
+MAX_WINDOW = 3  # longest run of words looked up as one phrase
+
+
+def embed(phrases: list[str], dim: int) -> np.ndarray:
+    """
+    One L2-normalized float32 row per phrase: its character 2- and 3-grams
+    (with word boundaries marked), hashed into `dim` signed buckets.
+    """
+    cells, signs = [], []
+    for row, phrase in enumerate(phrases):
+        padded = f" {phrase} "
+        for n in NGRAM_SIZES:
+            for i in range(len(padded) - n + 1):
+                h = zlib.crc32(padded[i:i + n].encode("utf-8"))
+                cells.append(row * dim + h % dim)
+                signs.append(1.0 if h & 0x80000000 else -1.0)
+
+    counts = np.bincount(np.array(cells, dtype=np.int64), weights=signs, minlength=len(phrases) * dim)
+    vectors = counts.astype(np.float32).reshape(len(phrases), dim)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-9)
+
+
+def label_phrase(label: str) -> str:
+    """
+    Catalog names and queries are embedded in the matcher's vocabulary
+    (normalized, stemmed, stopwords dropped), so both sides agree on word forms.
+    """
+    return " ".join(term for term, _ in tokenize(label))
+
+
+def load_synonyms(path: str) -> dict[str, list[str]]:
+    """
+    User-contributed synonyms: a JSON object of symptom ID --> list of phrases.
+    """
+    if not path:
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def catalog_fingerprint(catalog: list[dict], synonyms: dict[str, list[str]], dim: int) -> str:
+    """
+    Identifies what an index was built from, so a stale index file is never used.
+    """
+    digest = hashlib.sha256(f"{dim}".encode())
+    for symptom in catalog:
+        digest.update(f"\0{symptom['id']}\0{symptom.get('common_name')}\0{symptom.get('name')}".encode("utf-8"))
+    digest.update(json.dumps(synonyms, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class EmbeddingIndex:
+    """
+    One vector per catalog label (common name, name and any synonyms), several
+    per symptom. `matrix` holds them as columns (dim x labels), the layout the
+    query product is fastest with; it may be a memory-mapped array, shared by
+    every worker that loads the same file.
+    """
+
+    def __init__(self, row_ids: list[str], matrix: np.ndarray, fingerprint: str):
+        self.fingerprint = fingerprint
+        self.matrix = matrix
+        self.ids = list(dict.fromkeys(row_ids))
+        position = {symptom_id: i for i, symptom_id in enumerate(self.ids)}
+        self._row_owner = np.array([position[symptom_id] for symptom_id in row_ids], dtype=np.int32)
+        self.row_ids = row_ids
+
+    @classmethod
+    def build(cls, catalog: list[dict], synonyms: dict[str, list[str]], dim: int) -> "EmbeddingIndex":
+        row_ids, phrases = [], []
+        known = {symptom["id"] for symptom in catalog}
+        labels = [(s["id"], label) for s in catalog for label in {s.get("common_name"), s.get("name")} if label]
+        labels += [(symptom_id, label) for symptom_id, extra in synonyms.items() if symptom_id in known for label in extra]
+        for symptom_id, label in labels:
+            phrase = label_phrase(label)
+            if phrase:
+                row_ids.append(symptom_id)
+                phrases.append(phrase)
+        return cls(row_ids, np.ascontiguousarray(embed(phrases, dim).T), catalog_fingerprint(catalog, synonyms, dim))
+
+    def save(self, path: str):
+        """
+        Writes `path`.npy (the matrix) and `path`.json (row IDs and fingerprint),
+        each through a temp file and a rename, metadata last.
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".npy.tmp")
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, np.ascontiguousarray(self.matrix, dtype=np.float32))
+        os.replace(tmp_path, f"{path}.npy")
+
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".json.tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"fingerprint": self.fingerprint, "row_ids": self.row_ids}, f)
+        os.replace(tmp_path, f"{path}.json")
+
+    @classmethod
+    def load(cls, path: str, fingerprint: str) -> "EmbeddingIndex | None":
+        """
+        Memory-maps a saved index, or returns None if there is none for this fingerprint.
+        """
+        try:
+            with open(f"{path}.json", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta["fingerprint"] != fingerprint:
+                return None
+            matrix = np.load(f"{path}.npy", mmap_mode="r")
+        except (OSError, ValueError, KeyError):
+            return None
+        if matrix.shape[1] != len(meta["row_ids"]):
+            return None
+        return cls(meta["row_ids"], matrix, fingerprint)
+
+    def search(self, phrases: list[str], top_k: int) -> tuple[list[tuple[str, float]], list[tuple[str, float]]]:
+        """
+        Returns the best (symptom ID, cosine similarity) for each phrase, and
+        the `top_k` symptoms closest to any of the phrases, best first.
+        """
+        if not phrases or not self.ids:
+            return [], []
+        scores = embed(phrases, self.matrix.shape[0]) @ self.matrix  # phrases x labels
+
+        best_rows = scores.argmax(axis=1)
+        per_phrase = [(self.row_ids[row], float(scores[i, row])) for i, row in enumerate(best_rows)]
+
+        # Best score per symptom over all its rows and all phrases.
+        per_symptom = np.full(len(self.ids), -1.0, dtype=np.float32)
+        np.maximum.at(per_symptom, self._row_owner, scores.max(axis=0))
+        k = min(top_k, len(self.ids))
+        top = np.argpartition(-per_symptom, k - 1)[:k]
+        top = top[np.argsort(-per_symptom[top])]
+        return per_phrase, [(self.ids[i], float(per_symptom[i])) for i in top]
+
+    def refine(self, match: MatchResult, names: dict[str, str], top_k: int):
+        """
+        Second look at the words `match` left over. A run of them that is
+        nearly identical to a catalog label (EMBEDDING_CONFIDENT_SIMILARITY)
+        resolves to that symptom; one that is merely close
+        (EMBEDDING_CANDIDATE_SIMILARITY) is marked uncovered, so the LLM gets
+        to decide on it. The closest entries go first in the candidates.
+        """
+        windows = []  # (run index, start, end), longest first within each run
+        for r, run in enumerate(match.residual_runs):
+            for length in range(min(MAX_WINDOW, len(run)), 0, -1):
+                windows.extend((r, start, start + length) for start in range(len(run) - length + 1))
+        phrases = [" ".join(match.residual_runs[r][start:end]) for r, start, end in windows]
+
+        per_phrase, nearest = self.search(phrases, top_k)
+
+        claimed = [set() for _ in match.residual_runs]
+        resolved_terms = set()
+        for threshold in (settings.EMBEDDING_CONFIDENT_SIMILARITY, settings.EMBEDDING_CANDIDATE_SIMILARITY):
+            for (r, start, end), phrase, (symptom_id, score) in zip(windows, phrases, per_phrase):
+                positions = set(range(start, end))
+                if score < threshold or positions & claimed[r]:
+                    continue
+                claimed[r] |= positions
+                if threshold == settings.EMBEDDING_CONFIDENT_SIMILARITY:
+                    resolved_terms.update(match.residual_runs[r][start:end])
+                    if symptom_id not in match.confident_ids:
+                        match.confident_ids.append(symptom_id)
+                elif phrase not in match.uncovered_terms:
+                    match.uncovered_terms.append(phrase)
+        match.uncovered_terms = [term for term in match.uncovered_terms if term not in resolved_terms]
+
+        similar = [(symptom_id, names[symptom_id], score) for symptom_id, score in nearest
+                   if score >= settings.EMBEDDING_CANDIDATE_SIMILARITY and symptom_id in names]
+        seen = {symptom_id for symptom_id, _, _ in similar}
+        match.candidates = (similar + [c for c in match.candidates if c[0] not in seen])[:top_k]
+
+
+_indexes = {}  # age bucket --> (catalog the index was built from, index)
+
+
+def index_path(bucket: int) -> str:
+    return os.path.join(settings.EMBEDDING_INDEX_DIR, f"symptoms-{bucket}")
+
+
+def cached_embedding_index(bucket: int, catalog: list[dict]) -> EmbeddingIndex | None:
+    """
+    The index for an age bucket if one was already built from this catalog.
+    """
+    cached = _indexes.get(bucket)
+    return cached[1] if cached is not None and cached[0] is catalog else None
+
+
+def get_embedding_index(bucket: int, catalog: list[dict]) -> EmbeddingIndex:
+    """
+    Returns the index for an age bucket: the one in the catalog snapshot or
+    the prebuilt file under EMBEDDING_INDEX_DIR when it matches the catalog
+    (see `manage.py snapshot-catalogs` and `build-symptom-index`), otherwise
+    one built in memory. Like the matchers,
+    it is only rebuilt when the cached catalog for the bucket is replaced.
+    """
+    cached = _indexes.get(bucket)
+    if cached is None or cached[0] is not catalog:
+        synonyms = load_synonyms(settings.SYMPTOM_SYNONYMS_PATH)
+        fingerprint = catalog_fingerprint(catalog, synonyms, settings.EMBEDDING_DIM)
+        snapshot = current_snapshot()
+        index = snapshot.embedding_index(bucket, fingerprint) if snapshot is not None else None
+        if index is None and settings.EMBEDDING_INDEX_DIR:
+            index = EmbeddingIndex.load(index_path(bucket), fingerprint)
+        if index is None:
+            index = EmbeddingIndex.build(catalog, synonyms, settings.EMBEDDING_DIM)
+        cached = (catalog, index)
+        _indexes[bucket] = cached
+    return cached[1]
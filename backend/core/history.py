@@ -0,0 +1,87 @@
+# core/history.py
+from config.settings import settings
+from core.clients import openai_client
+from core.prompts import history_summary_messages
+from core.resilience import openai_upstream
+from core.routing import model_router
+from core.sessions import Session, Turn
+from core.telemetry import record_usage, span
+
+# The chat UI calls the user "patient"; the OpenAI API only accepts "user".
+ROLE_ALIASES = {"patient": "user"}
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap token estimate (about four characters per token for English text).
+    """
+    return len(text) // 4 + 4
+
+
+def normalize_history(chat_history: list[Turn]) -> list[Turn]:
+    """
+    Drops consecutive duplicate turns.
+    """
+    turns = []
+    for turn in chat_history:
+        if turns and turns[-1] == turn:
+            continue
+        turns.append(turn)
+    return turns
+
+
+def to_messages(turns: list[Turn]) -> list[dict]:
+    """
+    Maps turns onto LLM messages, with the roles the LLM accepts.
+    """
+    return [{"role": ROLE_ALIASES.get(turn.role, turn.role), "content": turn.content} for turn in turns]
+
+
+async def history_window(session: Session) -> list[dict]:
+    """
+    Returns the chat history to send to the LLM, kept within
+    HISTORY_TOKEN_BUDGET regardless of how long the session has run.
+
+    When the history overflows the budget, the oldest turns are folded into a
+    running summary stored on the session (and removed from its chat_history),
+    until what's left fits in half the budget. The summary is only recomputed
+    on overflow, so most turns reuse it as-is.
+    """
+    turns = normalize_history(session.chat_history)
+    budget = settings.HISTORY_TOKEN_BUDGET
+
+    if sum(estimate_tokens(turn.content) for turn in turns) > budget:
+        keep = []
+        kept_tokens = 0
+        for turn in reversed(turns):
+            kept_tokens += estimate_tokens(turn.content)
+            if kept_tokens > budget // 2 and keep:
+                break
+            keep.insert(0, turn)
+
+        folded = turns[:len(turns) - len(keep)]
+        if folded:
+            session.history_summary = await summarize_history(session.history_summary, folded)
+            session.chat_history = keep
+            turns = keep
+
+    messages = to_messages(turns)
+    if session.history_summary:
+        summary = {"role": "system", "content": f"Summary of the earlier conversation: {session.history_summary}"}
+        return [summary] + messages
+    return messages
+
+
+async def summarize_history(previous_summary: str | None, turns: list[Turn]) -> str:
+    route = model_router.route("history_summary")
+    with span("openai.history_summary"), model_router.timed(route):
+        completion = await openai_upstream.call(
+            "openai.history_summary",
+            lambda timeout: openai_client().chat.completions.create(
+                **route.params,
+                messages=history_summary_messages(previous_summary, turns),
+                timeout=timeout,
+            ),
+        )
+    record_usage("history_summary", completion.usage, route.model)
+    return completion.choices[0].message.content
@@ -0,0 +1,130 @@
+# core/interview.py
+# Infermedica's interview questions, as shown to the user and as read back from
+# their free-text reply. Replies are parsed with patterns rather than the LLM,
+# so an answer costs one /diagnosis call and nothing else.
+import re
+
+from core.sessions import Evidence, Question, QuestionItem
+
+UNKNOWN_RE = re.compile(r"\b(?:don'?t know|do not know|not sure|unsure|no idea|maybe|dunno|can'?t tell|idk)\b")
+NO_RE = re.compile(r"\b(?:no|nope|nah|none|neither|not|don'?t|do not|haven'?t|have not|never|without)\b")
+YES_RE = re.compile(r"\b(?:yes|yeah|yep|yup|yea|i do|correct|definitely|both|all of them|all of the above)\b")
+SKIP_RE = re.compile(r"\b(?:skip|stop asking|no more questions|enough questions|just tell me|give me (?:the|my) (?:diagnosis|result))\b")
+
+# Answers about several items are split into clauses, each with its own polarity:
+# "yes to the fever, but no cough" --> fever present, cough absent.
+_CLAUSE_RE = re.compile(r"[,;.!?]|\bbut\b|\bhowever\b")
+_NUMBER_RE = re.compile(r"\b(\d{1,2})\b")
+_WORD_RE = re.compile(r"[a-z0-9']+")
+
+# A yes/no/unknown without an item named only answers the question as a whole
+# when it stands alone ("no", "not sure") or opens the reply ("yes, since
+# Monday"). Anything longer may be about something else: "I have a sore
+# throat too" says nothing about the fever asked after.
+STANDALONE_WORDS = 4
+_LEADING_RE = re.compile(r"^\W*(?:yes|yeah|yep|yup|yea|no|nope|nah)\b")
+# Numbers pick items only from a reply that is just a list of them ("1 and 3"),
+# not from one that mentions a number ("for 2 days").
+_LIST_WORDS = {"and", "or", "only", "just", "but", "not", "no", "yes", "number", "numbers"}
+
+
+def parse_question(question: dict | None) -> Question | None:
+    """
+    The parts of the `question` in a /diagnosis response that the interview needs.
+    """
+    if not question or not question.get("items"):
+        return None
+    return Question(
+        question["type"],
+        question["text"],
+        [QuestionItem(item["id"], item["name"]) for item in question["items"]],
+    )
+
+
+def format_question(question: Question) -> str:
+    if question.type == "single":
+        return f"{question.text} (yes / no / don't know)"
+
+    options = "\n".join(f"{i}. {item.name}" for i, item in enumerate(question.items, 1))
+    if question.type == "group_single":
+        hint = "Reply with the number or name of the one that applies."
+    else:
+        hint = 'Reply with the numbers or names of all that apply, or "none".'
+    return f"{question.text}\n{options}\n{hint}"
+
+
+def _normalize(text: str) -> str:
+    return text.lower().replace("’", "'")
+
+
+def _choice(text: str) -> str | None:
+    """
+    The answer a piece of text gives: "unknown" is checked first, since
+    "I don't know" must not read as a "no".
+    """
+    if UNKNOWN_RE.search(text):
+        return "unknown"
+    if NO_RE.search(text):
+        return "absent"
+    if YES_RE.search(text):
+        return "present"
+    return None
+
+
+def _mentioned(question: Question, clause: str, by_number: bool) -> list[int]:
+    """
+    Indexes of the items a clause refers to, by name, and by number if
+    `by_number`.
+    """
+    indexes = set()
+    if by_number:
+        indexes.update(int(n) - 1 for n in _NUMBER_RE.findall(clause) if 0 < int(n) <= len(question.items))
+    indexes.update(i for i, item in enumerate(question.items) if _normalize(item.name) in clause)
+    return sorted(indexes)
+
+
+def wants_to_skip(text: str) -> bool:
+    return bool(SKIP_RE.search(_normalize(text)))
+
+
+def parse_answer(question: Question, text: str) -> list[Evidence]:
+    """
+    Evidence for the items of `question` from the user's reply; empty when the
+    reply doesn't answer it. Every item of a group question is answered at
+    once, so the whole reply goes to Infermedica in a single request.
+    """
+    text = _normalize(text)
+    words = _WORD_RE.findall(text)
+    standalone = len(words) <= STANDALONE_WORDS or bool(_LEADING_RE.match(text))
+    number_list = (
+        question.type != "single"
+        and any(word.isdigit() for word in words)
+        and all(word.isdigit() or word in _LIST_WORDS for word in words)
+    )
+
+    answers = {}  # item index --> choice
+    for clause in _CLAUSE_RE.split(text):
+        indexes = _mentioned(question, clause, number_list)
+        if indexes:
+            # An item picked from the list without a "yes" or "no" is a yes.
+            choice = _choice(clause.replace(question.items[indexes[0]].name.lower(), "")) or "present"
+            answers.update((i, choice) for i in indexes)
+
+    if question.type == "group_single":
+        # Exactly one option applies: the one picked, or none of them.
+        picked = [i for i, choice in answers.items() if choice == "present"]
+        if picked:
+            return [Evidence(question.items[picked[0]].id, "present", question.items[picked[0]].name)]
+        choice = _choice(text) if standalone else None
+        if choice in ("absent", "unknown") and not answers:
+            return [Evidence(item.id, choice, item.name) for item in question.items]
+        return []
+
+    if answers:
+        # Items left out of a list of those that apply don't.
+        return [Evidence(item.id, answers.get(i, "absent"), item.name) for i, item in enumerate(question.items)]
+
+    choice = _choice(text) if standalone else None
+    if choice is None:
+        return []
+    return [Evidence(item.id, choice, item.name) for item in question.items]
@@ -1,290 +1,505 @@
-import requests
-import openai # Already configured in config/settings.py, but good to import if used directly
-import re
+import asyncio
 import json
+import logging
+import re
+import sys
+import time
+from contextlib import aclosing
 from fastapi import HTTPException # For consistent error handling
 
-user_states = {}
-
 # Import settings for API keys
 from config.settings import settings
-
-
-def get_valid_symptoms_from_infermedica(age: int, sex: str):
-    # Note: your original get_symptoms_list had hardcoded age/sex
-    # This version correctly uses the passed arguments
-    url = f"https://api.infermedica.com/v3/symptoms?age.value={age}"
-    headers = {
-        "App-Id": settings.INFERMEDICA_APP_ID,
-        "App-Key": settings.INFERMEDICA_APP_KEY,
-        "Content-Type": "application/json",
-    }
-    response = requests.get(url, headers=headers)
-    if response.status_code != 200:
-        print(f"Error fetching symptoms: {response.status_code} - {response.text}")
-        raise HTTPException(status_code=response.status_code, detail="Failed to fetch symptoms list from Infermedica")
-    return response.json()
-
-def get_symptoms_list(user_age: int, user_sex: str):
+from core.catalog import symptom_catalog
+from core.clients import infermedica_client, openai_client
+from core.completion_cache import completion_cache, completion_key
+from core.demographics import extract_demographics
+from core.history import history_window
+from core.interview import format_question, parse_answer, parse_question, wants_to_skip
+from core.scheduler import TurnScheduler
+from core.sessions import Condition, ConditionDetails, Evidence, Session, idempotency_cache, session_locks, session_store
+from core.singleflight import SingleFlight
+from core.matching import get_symptom_matcher
+from core.prompts import diagnosis_summary_messages, extraction_messages, followup_messages
+from core.resilience import infermedica_upstream, openai_upstream
+from core.routing import Route, model_router
+from core.telemetry import extraction_rejections, record_transition, record_usage, span, stage_duration
+
+logger = logging.getLogger(__name__)
+
+condition_flights = SingleFlight()
+summary_flights = SingleFlight()
+
+
+async def get_valid_symptoms_from_infermedica(age: int, sex: str):
+    # The catalog only depends on the age bucket, so it is served from the cache
+    # and only re-fetched from Infermedica when the entry's TTL runs out.
+    return await symptom_catalog.get(age)
+
+async def get_symptoms_list(user_age: int, user_sex: str):
     """
     Returns a dictionary with symptom IDs as keys and common names as values
     for use by the LLM.
     """
-    symptoms_dict = get_valid_symptoms_from_infermedica(user_age, user_sex)
+    symptoms_dict = await get_valid_symptoms_from_infermedica(user_age, user_sex)
     # Ensure it returns a simple dictionary of id: common_name
     return {symptom["id"]: symptom["common_name"] for symptom in symptoms_dict}
 
-def extract_ids_from_llm(symptom_lines: list[str]) -> list[str]:
+# Structured output for symptom extraction. The schema is the same for every
+# request (the candidate IDs go in the prompt, not in an enum), so OpenAI only
+# has to process it once; IDs are checked against the catalog locally instead.
+SYMPTOM_EXTRACTION_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "symptom_extraction",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "symptom_ids": {"type": "array", "items": {"type": "string"}},
+            },
+            "required": ["symptom_ids"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+def extract_ids_from_llm(content: str, valid_ids) -> list[str]:
     """
-    Extracts symptom IDs from a list of strings returned by the LLM.
-    Assumes format 'ID: Common Name'
+    Parses the LLM's structured extraction output and returns the symptom IDs
+    it contains that exist in the catalog, without duplicates. Unknown IDs and
+    malformed output are dropped and counted rather than raised.
     """
-    symptom_ids = []
-    for item in symptom_lines:
-        if ":" in item:
-            symptom_id = item.split(":")[0].strip()
-            symptom_ids.append(symptom_id)
-    return symptom_ids
+    try:
+        symptom_ids = json.loads(content)["symptom_ids"]
+        if not isinstance(symptom_ids, list):
+            raise TypeError("symptom_ids is not a list")
+    except (TypeError, KeyError, ValueError) as e:
+        logger.warning("Discarding malformed symptom extraction output: %s", e)
+        extraction_rejections.inc(reason="malformed")
+        return []
 
+    accepted = []
+    for symptom_id in symptom_ids:
+        if symptom_id not in valid_ids:
+            extraction_rejections.inc(reason="unknown_id")
+            continue
+        if symptom_id not in accepted:
+            accepted.append(symptom_id)
+    return accepted
 
 
-def extract_user_info(session_info, text):
-    extracted_age = None
-    extracted_sex = None
 
-    age_match = re.search(r'my age is (\d+)|i\'m (\d+) (?:years old|yo)|i am (\d+) (?:years old|yo)|i\'m a (\d+) (?:year old|yo)|(/d+) (?:years old|yo)|\b(\d{1,3})\b', text.lower())
-    if age_match:
-        extracted_age = int(age_match.group(1) or age_match.group(2) or age_match.group(3) or age_match.group(4) or age_match.group(5) or age_match.group(6))
-        
+def extract_user_info(session: Session, text, turn: TurnScheduler):
+    demographics = extract_demographics(text)
 
-    # Extract sex
-    sex_match = re.search(r'(male|female|man|woman|boy|girl|guy)', text.lower())
-    if sex_match:
-        extracted_sex = sex_match.group(1) or sex_match.group(2) or sex_match.group(3) or sex_match.group(4) or sex_match.group(5) or sex_match.group(6) or sex_match.group(7)#or sex_match.group(2)
-        
+    if session.age is None and demographics.age is not None:
+        session.age, session.age_unit = demographics.age, demographics.age_unit
 
-    if session_info["age"]["value"] is None:
-        session_info["age"]["value"] = extracted_age
+    if session.sex is None:
+        session.sex = demographics.sex
 
-    if session_info["sex"] is None:
-        if extracted_sex == "man" or extracted_sex == "boy" or extracted_sex == "guy" or extracted_sex == "male":
-            session_info["sex"] = "male"
-        elif extracted_sex == "woman" or extracted_sex == "girl" or extracted_sex == "female":
-            session_info["sex"] = "female"
+    if session.age is not None and session.current_state == "initial_gathering":
+        # The catalog only needs the age, so start fetching it now: it overlaps
+        # with the rest of this turn, or warms the cache for the next one.
+        age = session.age_years
+        turn.start("catalog", lambda: symptom_catalog.get(age), deadline=settings.CATALOG_DEADLINE_SECONDS, background=True)
 
-    if(session_info["age"]["value"] is not None and session_info["sex"] is not None):
-        extracted_symptoms = extract_symptoms(session_info, text)
-        session_info["symptoms"] = extracted_symptoms
 
-def extract_symptoms(session_info: dict, user_input: str):
-    symptoms_list = get_symptoms_list(session_info["age"]["value"], session_info["sex"])
+GOODBYE_RE = re.compile(r"\b(?:bye|goodbye|thanks|thank you|thx|that'?s all)\b")
+QUESTION_RE = re.compile(r"\?\s*$|^\s*(?:what|how|why|when|where|which|who|should|can|could|is|are|do|does|will|would)\b")
+SYMPTOM_REPORT_RE = re.compile(r"\b(?:i have|i've|ive|i'm having|i am having|i feel|i'm feeling|i've got|i also|now i|started|getting|new)\b")
 
-    user_symptoms = user_input
-    session_info["chat_history"].append({"role": "user", "content": user_symptoms})
-
-    system_prompt = f"""
-    You are a medical assistant. The user will describe their symptoms in natural language.
-    Your task is to identify symptoms from the user’s input and map them **exactly** to entries in the approved list of symptoms provided below.
-    Only return symptoms that match exactly — do not summarize, shorten, combine, or infer symptoms. 
+async def route_turn(session: Session, text: str) -> str:
+    """
+    Decides what a message needs before any expensive call is made:
+    "info" (still waiting for age/sex, nothing to extract), "symptoms" (run
+    symptom extraction), "question" (answer it, symptoms are already known)
+    or "goodbye". During the interview, also "answer" (it answers the
+    pending question) and "skip" (the user wants the result now).
+    """
+    if session.age is None or session.sex is None:
+        return "info"
+    if session.current_state == "initial_gathering":
+        return "symptoms"
+    if session.current_state == "interview":
+        if wants_to_skip(text):
+            return "skip"
+        if parse_answer(session.question, text):
+            return "answer"
+
+    lowered = text.lower().replace("’", "'")
+    if GOODBYE_RE.search(lowered) and "?" not in lowered:
+        return "goodbye"
+
+    if await reports_symptoms(session, text):
+        return "symptoms"
+    return "question"
+
+
+async def reports_symptoms(session: Session, text: str, ignore: set[str] = frozenset()) -> bool:
     """
+    Whether a message reports symptoms other than the `ignore` IDs, judged by
+    the local matcher alone. Only reports need extraction: "is a fever
+    dangerous?" mentions one but only asks about it.
+    """
+    lowered = text.lower().replace("’", "'")
+    matcher = await get_session_matcher(session)
+    match = matcher.match(text, top_k=1)
+    mentions_symptoms = bool(set(match.confident_ids) - ignore or match.uncovered_terms)
+    return mentions_symptoms and (not QUESTION_RE.search(lowered) or bool(SYMPTOM_REPORT_RE.search(lowered)))
 
-    user_prompt = f"""
-    The user said: "{user_symptoms}"
+async def get_session_matcher(session: Session):
+    age = session.age_years
+    catalog = await get_valid_symptoms_from_infermedica(age, session.sex)
+    return get_symptom_matcher(symptom_catalog.bucket_for_age(age), catalog)
 
-    Only use symptoms from this list:
-    {json.dumps(symptoms_list)}
 
-    Use only the terms exactly as they appear in the list. If the symptom the user describes is not in the list, do not include it.
-    Return a comma-separated dictionary with both the term AND its id using only the terms from the list, without quotes or brackets.
-    """
+_embeddings = None  # core/embeddings.py once imported; it brings numpy with it
 
-    completion = openai.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt}
-        ]
-    )
 
-    symptoms_list = [sym.strip() for sym in completion.choices[0].message.content.split(",")]
+async def embedding_index(bucket: int, catalog: list[dict]):
+    """
+    The symptom vector index for an age bucket. Importing numpy and building
+    or loading an index take tens of milliseconds or more, so the first use
+    and the first use after each catalog refresh run in a worker thread
+    instead of stalling every request on the event loop.
+    """
+    global _embeddings
+    if _embeddings is not None:
+        index = _embeddings.cached_embedding_index(bucket, catalog)
+        if index is not None:
+            return index
 
-    session_info["symptoms"] = symptoms_list
+    def load():
+        from core import embeddings
 
-    id_extraction = extract_ids_from_llm(symptoms_list)
+        return embeddings, embeddings.get_embedding_index(bucket, catalog)
 
-    return id_extraction
+    _embeddings, index = await asyncio.to_thread(load)
+    return index
 
 
-def symptoms_conversion(user_input: str): #takes the users input symptoms and returns a list of matching symptoms within the infermedica symptoms list WORKING!!
-    symptoms_list = get_symptoms_list()
+async def extract_symptoms(session: Session, user_input: str):
+    age = session.age_years
+    bucket = symptom_catalog.bucket_for_age(age)
+    catalog = await get_valid_symptoms_from_infermedica(age, session.sex)
+    matcher = get_symptom_matcher(bucket, catalog)
 
     user_symptoms = user_input
-    #session_info["chat_history"].append({"role": "user", "content": user_symptoms})
 
-    system_prompt = f"""
-    You are a medical assistant. The user will describe their symptoms in natural language.
-    Your task is to identify symptoms from the user’s input and map them **exactly** to entries in the approved list of symptoms provided below.
-    Only return symptoms that match exactly — do not summarize, shorten, combine, or infer symptoms. 
-    """
+    # Resolve what we can locally; the LLM is only asked about the leftovers,
+    # and only sees the few catalog entries that could plausibly match.
+    with span("match"):
+        match = matcher.match(user_symptoms, top_k=settings.SYMPTOM_MATCH_TOP_K)
+        if match.residual_runs:
+            index = await embedding_index(bucket, catalog)
+            index.refine(match, matcher.names, settings.SYMPTOM_MATCH_TOP_K)
+    if match.is_conclusive or not match.candidates:
+        return match.confident_ids
+
+    symptoms_list = {symptom_id: common_name for symptom_id, common_name, _ in match.candidates}
+
+    route = model_router.route("extract")
+    with span("openai.extract"), model_router.timed(route):
+        completion = await openai_upstream.call(
+            "openai.extract",
+            lambda timeout: openai_client().chat.completions.create(
+                **route.params,
+                messages=extraction_messages(symptoms_list, user_symptoms),
+                response_format=SYMPTOM_EXTRACTION_FORMAT,
+                timeout=timeout,
+            ),
+        )
+    record_usage("extract", completion.usage, route.model)
+
+    id_extraction = extract_ids_from_llm(completion.choices[0].message.content, matcher.names)
+    for symptom_id in match.confident_ids:
+        if symptom_id not in id_extraction:
+            id_extraction.append(symptom_id)
 
-    user_prompt = f"""
-    The user said: "{user_symptoms}"
+    return id_extraction
 
-    Only use symptoms from this list:
-    {json.dumps(symptoms_list)}
 
-    Use only the terms exactly as they appear in the list. If the symptom the user describes is not in the list, do not include it.
-    Return a comma-separated dictionary with both the term AND its id using only the terms from the list, without quotes or brackets.
+async def stream_completion(route: Route, messages: list[dict]):
     """
-
-    completion = openai.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt}
-        ]
-    )
-
-    symptoms_list = [sym.strip() for sym in completion.choices[0].message.content.split(",")]
-    #session_info["symptoms"] = symptoms_list
-
-    return extract_ids_from_llm(symptoms_list)
-
-
-def get_diagnosis(age: dict, sex: str, symptoms: list[str]): #sending user info/sympotms for diagnosis - post request - /diagnosis
-    url = "https://api.infermedica.com/v3/diagnosis"
-    headers = {
-        "App-Id": settings.INFERMEDICA_APP_ID,
-        "App-Key": settings.INFERMEDICA_APP_KEY,
-        "Content-Type": "application/json"}
-    
-    symptoms = [{"id": s, "choice_id": "present"} for s in symptoms]
+    Yields the content of a chat completion piece by piece as the model generates it.
+    Time to first token and the token usage reported at the end of the stream
+    are recorded under the route's task name; the time to first token is also
+    the latency the model router judges the task by.
+    """
+    stage = route.task
+    model_router.started(route)
+    with span(f"openai.{stage}"):
+        start = time.perf_counter()
+        stream = openai_upstream.stream(
+            f"openai.{stage}",
+            lambda timeout: openai_client().chat.completions.create(
+                **route.params, messages=messages, stream=True, stream_options={"include_usage": True}, timeout=timeout,
+            ),
+        )
+        first_token = True
+        # aclosing() hands the upstream slot back as soon as the consumer stops
+        async with aclosing(stream):
+            try:
+                async for chunk in stream:
+                    if chunk.usage is not None:
+                        record_usage(stage, chunk.usage, route.model)
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        if first_token:
+                            first_token_seconds = time.perf_counter() - start
+                            stage_duration.observe(first_token_seconds, stage=f"openai.{stage}.first_token")
+                            model_router.observe(route, first_token_seconds)
+                            first_token = False
+                        yield chunk.choices[0].delta.content
+            except HTTPException as e:
+                # A stream that timed out before its first token is as slow as it gets
+                if first_token and e.status_code == 504:
+                    model_router.observe(route, time.perf_counter() - start)
+                raise
+
+
+async def get_diagnosis(age: dict, sex: str, symptoms: list[str], answers: list[Evidence] = ()) -> dict: #sending user info/sympotms for diagnosis - post request - /diagnosis
+    """
+    `symptoms` are the IDs the user reported; `answers` their replies to
+    interview questions, which take precedence for the same ID.
+    """
+    answered = {answer.id for answer in answers}
+    evidence = [{"id": s, "choice_id": "present", "source": "initial"} for s in symptoms if s not in answered]
+    evidence += [{"id": answer.id, "choice_id": answer.choice_id} for answer in answers]
 
     payload = {
         "age": age,
         "sex": sex,
-        "evidence": symptoms
+        "evidence": evidence
     }
 
-    response = requests.post('https://api.infermedica.com/v3/diagnosis', headers=headers, json=payload) #there's an issue here
-    print("Infermedica Diagnosis:", response.json())
-
-    #session_info["current_diagnosis"] = response.json()
-
-    summarized_diagnosis = summarize_diagnosis(response.json())
-
+    with span("infermedica.diagnosis"):
+        # /diagnosis is a pure function of the evidence sent, so it is safe to retry
+        response = await infermedica_upstream.call(
+            "infermedica.diagnosis",
+            lambda timeout: infermedica_client().post("/diagnosis", json=payload, timeout=timeout),
+            idempotent=True,
+        )
     if response.status_code != 200:
+        logger.error("Infermedica diagnosis failed: %s - %s", response.status_code, response.text)
         raise HTTPException(status_code=response.status_code, detail="Infermedica API error")
-    return summarized_diagnosis
 
-def summarize_diagnosis(diagnosis_data: dict):
-    conditions = diagnosis_data.get("conditions", [])
-    top_condition = conditions[0] if conditions else {"name": "unknown", "probability": 0}
-    
-    prompt = f"""
-        You are HealthTalk, an AI medical assistant. Respond kindly and empathetically, as a caring medical assistant would. 
-        Offer reassurance when appropriate.
+    diagnosis = response.json()
+    logger.debug("Infermedica diagnosis: %s", diagnosis)
+    return diagnosis
+
+async def get_condition_details(condition_id: str, age: int) -> dict: #getting additional information about the diagnosis - get request - /conditions/{id}
+    # Sessions diagnosed with the same condition at the same time share one lookup
+    return await condition_flights.do((condition_id, age), lambda: fetch_condition_details(condition_id, age))
+
+async def fetch_condition_details(condition_id: str, age: int) -> dict:
+    with span("infermedica.condition"):
+        response = await infermedica_upstream.call(
+            "infermedica.condition",
+            lambda timeout: infermedica_client().get(f"/conditions/{condition_id}", params={"age.value": age}, timeout=timeout),
+            idempotent=True,
+        )
+    if response.status_code != 200:
+        raise HTTPException(status_code=response.status_code, detail="Failed to fetch condition details from Infermedica")
+
+    details = response.json()
+    return {
+        "id": details["id"],
+        "common_name": details.get("common_name"),
+        "severity": details.get("severity"),
+        "acuteness": details.get("acuteness"),
+        "triage_level": details.get("triage_level"),
+        "hint": details.get("extras", {}).get("hint"),
+    }
 
-        A user has entered symptoms and received the following top condition: {top_condition['common_name']}. 
-        Frame the condition as a suggesstion, not as something sure.
+async def summarize_diagnosis(diagnosis_data: dict):
+    """
+    Yields the LLM's explanation of the top condition in chunks as it is generated.
+    The prompt only depends on the top condition, so summaries are served from
+    the completion cache whenever that condition has been summarized before.
+    """
+    conditions = diagnosis_data.get("conditions", [])
+    top_condition = conditions[0] if conditions else {"name": "unknown", "common_name": "unknown", "probability": 0}
 
-        Please give them an explanation of the condition and provide some advice on how to manage it.
-        After the explanation, ask the patient if they think the condition is correct.
+    route = model_router.route("diagnosis_summary")
+    messages = diagnosis_summary_messages(top_condition)
+    cache_key = completion_key(route.model, messages)
 
-        If the condition is urgent, emphasize the urgency and encourage them to get to a medical professional quickly.
+    cached_summary = completion_cache.get(cache_key)
+    if cached_summary is not None:
+        yield cached_summary
+        return
 
-        Please summarize the following condition and advice including headings, bullet points for key takeaways, and bold text for important concepts. 
-        Remember to ask the user if they think the condition is accurate.
-    """
+    async def generate():
+        summary = ""
+        async for chunk in stream_completion(route, messages):
+            summary += chunk
+            yield chunk
+        completion_cache.set(cache_key, summary)
 
-    completion = openai.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[{"role": "system", "content": prompt}]
-    )
+    # Concurrent misses for the same summary share one LLM stream
+    async for chunk in summary_flights.stream(cache_key, generate):
+        yield chunk
 
-    #session_info["chat_history"].append({"role": "assistant", "content": completion.choices[0].message.content})
 
-    return completion.choices[0].message.content
+async def followup_questions(session: Session, user_message: str):
+    """
+    Yields the LLM's follow-up reply in chunks as it is generated.
+    """
+    # Recent turns plus a running summary of older ones, within a fixed token budget
+    chat_history_for_llm = await history_window(session)
+    messages = followup_messages(session, chat_history_for_llm)
 
+    async for chunk in stream_completion(model_router.route("followup"), messages):
+        yield chunk
 
-def followup_questions(session_info: dict, user_message: str) -> str:
-    # Use session_info["chat_history"] for full context
-    chat_history_for_llm = [
-        {"role": msg["role"], "content": msg["content"]}
-        for msg in session_info["chat_history"]
-    ]
 
-    prompt = f"""
-        You are HealthTalk, an AI medical assistant. Respond kindly and empathetically, as a caring medical assistant would. 
-        Offer reassurance when appropriate.
 
-        The user has just responded with: "{user_message}".
-        Based on the previous conversation history and the current state of information about the user's age, sex, and symptoms:
+async def process_user_message(session_id: str, user_message: str, idempotency_key: str | None = None) -> str:
+    """
+    Runs one conversation turn and returns the assistant's full reply.
+    """
+    return "".join([chunk async for chunk in stream_user_message(session_id, user_message, idempotency_key)])
 
-        User Info: Age: {session_info['age']['value']}, Sex: {session_info['sex']}, Symptoms: {session_info['symptoms']}
-        Current Diagnosis (if any): {session_info.get('diagnosis_data', 'N/A')}
 
-        Decide on the best follow-up action:
-        1. If the user provided new symptoms, acknowledge them and ask if there's anything else.
-        2. If the user is asking general questions about their diagnosis, provide helpful, summarized information.
-        3. If the user is ending the conversation (e.g., "bye", "thanks"), respond appropriately.
-        4. If you need more information for a better diagnosis, ask relevant questions based on what's missing or what Infermedica might suggest (though Infermedica follow-ups are not implemented here yet).
-        5. If the user asks something you don't understand, politely ask for clarification.
+async def stream_user_message(session_id: str, user_message: str, idempotency_key: str | None = None):
     """
+    Runs one conversation turn, yielding the assistant's reply in chunks as
+    soon as they are available. The session is saved once the reply is complete.
 
-    messages = chat_history_for_llm + [{"role": "system", "content": prompt}]
+    Turns of the same session run one at a time. With an `idempotency_key`,
+    the reply is stored for a while and a retry gets it back in one chunk,
+    even if it arrives while the original is still running.
+    """
+    async with session_locks.hold(session_id):
+        if idempotency_key is not None:
+            try:
+                reply = idempotency_cache.get(session_id, idempotency_key, user_message)
+            except ValueError as e:
+                raise HTTPException(status_code=422, detail=str(e))
+            if reply is not None:
+                yield reply
+                return
 
-    completion = openai.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=messages
-    )
-    return completion.choices[0].message.content
+        reply = ""
+        async for chunk in converse(session_id, user_message):
+            reply += chunk
+            yield chunk
 
+        if idempotency_key is not None:
+            idempotency_cache.set(session_id, idempotency_key, user_message, reply)
 
 
-def process_user_message(session_id: str, user_message: str) -> str:
-    if session_id not in user_states:
-        user_states[session_id] = {
-            "age": {"value": None, "unit": "year"},
-            "sex": None,
-            "symptoms": [], # List of symptom IDs
-            "chat_history": [],
-            "is_diagnosed": False,
-            "diagnosis_data": None, # Store raw Infermedica diagnosis
-            "current_state": "initial_gathering"
-        }
-        
-    session_info = user_states[session_id]
+async def converse(session_id: str, user_message: str):
+    session = await session_store.get(session_id) or Session()
 
-    if not user_message and not session_info["chat_history"]:
+    if not user_message and not session.chat_history:
         initial_greeting = "Hi, I'm HealthTalk — your AI-powered health assistant. I can help you understand symptoms, provide general health guidance, and determine when you should seek professional medical care.\n\nPlease remember that I provide general information only and cannot replace professional medical advice. For emergencies, always call 911 immediately.\n\n To get started, can you tell me your age, sex, and what symptoms you're experiencing?"
-        session_info["chat_history"].append({"role": "assistant", "content": initial_greeting})
-        return initial_greeting
+        session.add_turn("assistant", initial_greeting)
+        await session_store.save(session_id, session)
+        yield initial_greeting
+        return
     
-    session_info["chat_history"].append({"role": "patient", "content": user_message})
-    extract_user_info(session_info, user_message)
+    session.add_turn("patient", user_message)
+    with span("turn"):
+        async with TurnScheduler() as turn:
+            async for chunk in run_turn(turn, session_id, session, user_message):
+                yield chunk
+
+
+async def interview_step(turn: TurnScheduler, session: Session, finish: bool = False):
+    """
+    Sends everything known so far to Infermedica and either asks its next
+    question or, once it has enough (should_stop, no question left, or
+    INTERVIEW_MAX_QUESTIONS asked), gives the diagnosis. With `finish`, gives
+    the diagnosis from what is known now.
+    """
+    turn.start(
+        "diagnosis",
+        lambda: get_diagnosis(session.age_payload, session.sex, session.symptoms, session.evidence),
+        deadline=settings.DIAGNOSIS_DEADLINE_SECONDS,
+    )
+    diagnosis_data = await turn.result("diagnosis")
+
+    question = parse_question(diagnosis_data.get("question"))
+    if (question is not None and not diagnosis_data.get("should_stop") and not finish
+            and session.questions_asked < settings.INTERVIEW_MAX_QUESTIONS):
+        if session.current_state != "interview":
+            record_transition(session, "interview")
+        session.question = question
+        session.questions_asked += 1
+        yield format_question(question)
+        return
+
+    session.question = None
+    session.conditions = [
+        Condition(sys.intern(c["id"]), c["common_name"], c["probability"])
+        for c in diagnosis_data.get("conditions", [])
+    ]
+
+    # Condition details only feed later follow-ups, so they are fetched
+    # in parallel while the summary streams.
+    age = session.age_years
+    for condition in session.conditions[:settings.CONDITION_DETAILS_TOP_N]:
+        turn.start(
+            f"condition:{condition.id}",
+            lambda condition_id=condition.id: get_condition_details(condition_id, age),
+            deadline=settings.CONDITION_DETAILS_DEADLINE_SECONDS,
+        )
+
+    async for chunk in summarize_diagnosis(diagnosis_data):
+        yield chunk
+
+    details = await turn.results("condition:", default=None)
+    session.condition_details = [ConditionDetails(**d) for d in details if d is not None]
+
+    session.is_diagnosed = True
+    record_transition(session, "follow_up")
+
+
+async def run_turn(turn: TurnScheduler, session_id: str, session: Session, user_message: str):
+    extract_user_info(session, user_message, turn)
+
+    with span("route"):
+        intent = await route_turn(session, user_message)
+    logger.debug("Routed turn as %s in state %s", intent, session.current_state)
+    if intent == "symptoms":
+        with span("extract"):
+            found_symptoms = await extract_symptoms(session, user_message)
+        session.add_symptoms(found_symptoms)
+    elif intent == "answer":
+        answers = parse_answer(session.question, user_message)
+        session.add_evidence(answers)
+        # "No, but I have a sore throat": symptoms reported alongside the answer
+        # go to Infermedica with it. The answer wins for the items it covers.
+        answered = {answer.id for answer in answers}
+        if await reports_symptoms(session, user_message, ignore=answered):
+            with span("extract"):
+                found_symptoms = await extract_symptoms(session, user_message)
+            session.add_symptoms([symptom_id for symptom_id in found_symptoms if symptom_id not in answered])
 
     assistant_response = ""
 
-    if session_info["current_state"] == "initial_gathering":
+    if session.current_state == "initial_gathering":
         currently_needed = []
 
-        if session_info["age"]["value"] is None:
+        if session.age is None:
             currently_needed.append("your age")
 
-        if session_info["sex"] is None:
+        if session.sex is None:
             currently_needed.append("your sex (male/female)")
 
-        if len(session_info["symptoms"]) == 0:
+        if len(session.symptoms) == 0:
             currently_needed.append("your symptoms")
 
         if not currently_needed:
-            assistant_response = "Thank you for providing all the necessary information. Let me analyze this for a diagnosis."
-            session_info["current_state"] = "diagnosis_ready"
-            assistant_response += get_diagnosis(session_info["age"], session_info["sex"], session_info["symptoms"])
+            assistant_response = "Thank you for providing all the necessary information. Let me analyze this for a diagnosis.\n\n"
+            record_transition(session, "diagnosis_ready")
+            yield assistant_response
 
-            session_info["is_diagnosed"] = True
-            session_info["current_state"] = "follow_up"
+            async for chunk in interview_step(turn, session):
+                assistant_response += chunk
+                yield chunk
 
         else:
 
@@ -294,21 +509,39 @@ def process_user_message(session_id: str, user_message: str) -> str:
                 assistant_response = f"Got it. I also need {currently_needed[0]} and {currently_needed[1]}."
             else:
                 assistant_response = f"Please provide {', '.join(currently_needed)}."
+            yield assistant_response
                 
 
-    elif session_info["current_state"] == "follow_up":
-        #I need to add something here for when the user provides new symptoms
-
-        if "bye" in user_message.lower() or "thanks" in user_message.lower():
-            assistant_response = "You're welcome! Feel free to reach out if you have more questions. Goodbye!"
-            # End session for this example
-            user_states.pop(session_id)
+    elif intent == "goodbye":
+        assistant_response = "You're welcome! Feel free to reach out if you have more questions. Goodbye!"
+        # End session for this example
+        record_transition(session, "ended")
+        await session_store.delete(session_id)
+        yield assistant_response
+        return
+
+    elif session.current_state == "interview":
+        # Answers and new symptoms were already recorded above; both go to
+        # Infermedica together in the next round.
+        if intent in ("answer", "symptoms", "skip"):
+            async for chunk in interview_step(turn, session, finish=intent == "skip"):
+                assistant_response += chunk
+                yield chunk
         else:
-            assistant_response = followup_questions(session_info, user_message)
-
-    session_info["chat_history"].append({"role": "assistant", "content": assistant_response})
-
-    return assistant_response
+            assistant_response = (
+                f"Before I can narrow this down, I need an answer to this:\n{format_question(session.question)}\n"
+                'You can also say "skip" to get the result now.'
+            )
+            yield assistant_response
+
+    elif session.current_state == "follow_up":
+        # New symptoms in this message were already merged in by route_turn/extract_symptoms above
+        async for chunk in followup_questions(session, user_message):
+            assistant_response += chunk
+            yield chunk
+
+    session.add_turn("assistant", assistant_response)
+    await session_store.save(session_id, session)
     
 
  
\ No newline at end of file
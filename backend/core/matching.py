@@ -0,0 +1,228 @@
+# core/matching.py
+import math
+import re
+import unicodedata
+from collections import Counter
+from dataclasses import dataclass, field
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset("""
+    a about after all also am an and any are as at be been before being bit but by can could
+    day days did do does doing dont during feel feeling feels felt for from get getting got had
+    has have having he her him his how i im ive if in into is it its just kind last like little
+    lot me mine more most much my myself now of off on or our out over past pretty quite really
+    recently she should since so some something sort than that the their them then there these they
+    this those through to too very was we week weeks were what when where which while who why
+    will with would year years yo old you your
+    age aged male female man woman boy girl guy
+""".split())
+
+NEGATIONS = frozenset({"no", "not", "without", "never", "dont", "didnt", "havent", "hasnt", "isnt", "arent", "none"})
+
+# Lay phrasing mapped onto the vocabulary used by the catalog's names.
+SYNONYMS = {
+    "tummy": "abdominal",
+    "belly": "abdominal",
+    "stomach ache": "abdominal pain",
+    "stomachache": "abdominal pain",
+    "throw up": "vomiting",
+    "throwing up": "vomiting",
+    "threw up": "vomiting",
+    "puke": "vomiting",
+    "puking": "vomiting",
+    "dizzy": "dizziness",
+    "lightheaded": "dizziness",
+    "tired": "fatigue",
+    "exhausted": "fatigue",
+    "exhaustion": "fatigue",
+    "worn out": "fatigue",
+    "temperature": "fever",
+    "feverish": "fever",
+    "stuffy nose": "nasal congestion",
+    "blocked nose": "nasal congestion",
+    "hard to breathe": "shortness of breath",
+    "short of breath": "shortness of breath",
+    "breathless": "shortness of breath",
+    "cant breathe": "shortness of breath",
+    "head hurts": "headache",
+    "hurts": "pain",
+    "hurt": "pain",
+    "hurting": "pain",
+    "ache": "pain",
+    "aching": "pain",
+    "sore": "pain",
+    "itchy": "itching",
+    "pee": "urination",
+    "peeing": "urination",
+    "poop": "stool",
+    "the runs": "diarrhea",
+    "diarrhoea": "diarrhea",
+    "heart racing": "rapid heartbeat",
+    "heart is beating really fast": "rapid heartbeat",
+    "heart beating fast": "rapid heartbeat",
+    "blotchy": "skin rash",
+}
+
+_SYNONYM_RE = re.compile(r"\b(" + "|".join(re.escape(k) for k in sorted(SYNONYMS, key=len, reverse=True)) + r")\b")
+
+
+def normalize(text: str) -> str:
+    """
+    Lowercases, strips accents and apostrophes, and rewrites lay phrasing
+    into catalog vocabulary.
+    """
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii")
+    text = text.lower().replace("'", "").replace("’", "")
+    return _SYNONYM_RE.sub(lambda m: SYNONYMS[m.group(1)], text)
+
+
+def stem(token: str) -> str:
+    for suffix, replacement in (("ies", "y"), ("ness", ""), ("ing", ""), ("ed", ""), ("s", "")):
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3 and not token.endswith("ss"):
+            return token[: -len(suffix)] + replacement
+    return token
+
+
+def tokenize(text: str) -> list[tuple[str, bool]]:
+    """
+    Returns the content tokens of `text` as (stem, negated) pairs. A token is
+    negated when it is one of the two content tokens following a negation word
+    (a "but" ends the negation early).
+    """
+    tokens = []
+    negation_window = 0
+    for raw in _TOKEN_RE.findall(normalize(text)):
+        if raw in NEGATIONS:
+            negation_window = 2
+            continue
+        if raw == "but":
+            negation_window = 0
+        if raw in STOPWORDS:
+            continue
+        tokens.append((stem(raw), negation_window > 0))
+        negation_window = max(negation_window - 1, 0)
+    return tokens
+
+
+@dataclass
+class MatchResult:
+    confident_ids: list[str] = field(default_factory=list)
+    candidates: list[tuple[str, str, float]] = field(default_factory=list)  # (id, common_name, score)
+    uncovered_terms: list[str] = field(default_factory=list)
+    residual_runs: list[list[str]] = field(default_factory=list)  # consecutive terms no phrase matched, negated ones excluded
+
+    @property
+    def is_conclusive(self) -> bool:
+        """
+        True when every symptom-like word in the message was resolved locally,
+        so the LLM has nothing left to add.
+        """
+        return bool(self.confident_ids) and not self.uncovered_terms
+
+
+class SymptomMatcher:
+    """
+    Local index over the symptom catalog's names.
+
+    Catalog names are matched as whole phrases (in any word order) for
+    high-confidence hits, and BM25 over the same terms ranks the remaining
+    entries so only a short candidate list needs to go to the LLM.
+    """
+
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self, catalog: list[dict]):
+        self.names = {}
+        self._phrases = {}  # frozenset of stems --> symptom IDs
+        self._postings = {}  # stem --> {symptom ID: term frequency}
+        self._doc_lengths = {}
+
+        for symptom in catalog:
+            symptom_id = symptom["id"]
+            self.names[symptom_id] = symptom["common_name"]
+            doc_terms = []
+            for label in {symptom.get("common_name"), symptom.get("name")}:
+                if not label:
+                    continue
+                terms = [term for term, _ in tokenize(label)]
+                if terms:
+                    self._phrases.setdefault(frozenset(terms), []).append(symptom_id)
+                    doc_terms.extend(terms)
+            for term, count in Counter(doc_terms).items():
+                self._postings.setdefault(term, {})[symptom_id] = count
+            self._doc_lengths[symptom_id] = len(doc_terms)
+
+        self._max_phrase_len = max((len(p) for p in self._phrases), default=0)
+        self._avg_doc_length = (sum(self._doc_lengths.values()) / len(self._doc_lengths)) if self._doc_lengths else 0.0
+        total = len(self._doc_lengths)
+        self._idf = {
+            term: math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self._postings.items()
+        }
+
+    def match(self, text: str, top_k: int) -> MatchResult:
+        tokens = tokenize(text)
+        result = MatchResult()
+        covered = [False] * len(tokens)
+
+        # Longest phrases first so "chest pain" wins over "pain".
+        for length in range(min(self._max_phrase_len, len(tokens)), 0, -1):
+            for start in range(len(tokens) - length + 1):
+                window = tokens[start:start + length]
+                if any(covered[start:start + length]) or any(negated for _, negated in window):
+                    continue
+                ids = set(self._phrases.get(frozenset(term for term, _ in window), ()))
+                # Ambiguous phrases (shared by several entries) are left for the LLM.
+                if len(ids) == 1 and len({term for term, _ in window}) == length:
+                    symptom_id = ids.pop()
+                    if symptom_id not in result.confident_ids:
+                        result.confident_ids.append(symptom_id)
+                    covered[start:start + length] = [True] * length
+
+        result.uncovered_terms = [
+            term for (term, _), is_covered in zip(tokens, covered)
+            if not is_covered and term in self._postings
+        ]
+        run = []
+        for (term, negated), is_covered in zip(tokens, covered):
+            if is_covered or negated:
+                if run:
+                    result.residual_runs.append(run)
+                run = []
+            else:
+                run.append(term)
+        if run:
+            result.residual_runs.append(run)
+        result.candidates = self._rank([term for term, _ in tokens], top_k)
+        return result
+
+    def _rank(self, terms: list[str], top_k: int) -> list[tuple[str, str, float]]:
+        scores = {}
+        for term in set(terms):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = self._idf[term]
+            for symptom_id, tf in postings.items():
+                norm = 1 - self.B + self.B * self._doc_lengths[symptom_id] / self._avg_doc_length
+                scores[symptom_id] = scores.get(symptom_id, 0.0) + idf * tf * (self.K1 + 1) / (tf + self.K1 * norm)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+        return [(symptom_id, self.names[symptom_id], score) for symptom_id, score in ranked]
+
+
+_matchers = {}  # age bucket --> (catalog the index was built from, matcher)
+
+
+def get_symptom_matcher(bucket: int, catalog: list[dict]) -> SymptomMatcher:
+    """
+    Returns the matcher for an age bucket, rebuilding it only when the cached
+    catalog for that bucket has been replaced.
+    """
+    cached = _matchers.get(bucket)
+    if cached is None or cached[0] is not catalog:
+        cached = (catalog, SymptomMatcher(catalog))
+        _matchers[bucket] = cached
+    return cached[1]
@@ -0,0 +1,89 @@
+# core/prompts.py
+# Every LLM request is assembled here so that it starts with a byte-identical
+# static prefix (persona and task instructions) and only then the per-user
+# content. OpenAI caches prompt prefixes (from 1024 tokens, in 128-token
+# steps), so anything variable placed early would make every request a miss.
+# Follow-ups also keep the append-only chat history ahead of the per-turn
+# context, so a session's earlier turns are reused from the cache on the next one.
+import json
+
+from core.sessions import Session, Turn
+
+PERSONA = """You are HealthTalk, an AI medical assistant. Respond kindly and empathetically, as a caring medical assistant would.
+Offer reassurance when appropriate."""
+
+EXTRACTION_INSTRUCTIONS = """You are a medical assistant. The user will describe their symptoms in natural language.
+Your task is to identify symptoms from the user's input and map them **exactly** to entries in the approved list of symptoms provided with the message.
+Only return symptoms that match exactly — do not summarize, shorten, combine, or infer symptoms.
+Use only the terms exactly as they appear in the list. If the symptom the user describes is not in the list, do not include it.
+Return the ids (the keys of the list) of every matching symptom in "symptom_ids"."""
+
+DIAGNOSIS_SUMMARY_INSTRUCTIONS = PERSONA + """
+
+A user has entered symptoms and received a top condition, given in the next message.
+Frame the condition as a suggesstion, not as something sure.
+
+Please give them an explanation of the condition and provide some advice on how to manage it.
+After the explanation, ask the patient if they think the condition is correct.
+
+If the condition is urgent, emphasize the urgency and encourage them to get to a medical professional quickly.
+
+Please summarize the following condition and advice including headings, bullet points for key takeaways, and bold text for important concepts.
+Remember to ask the user if they think the condition is accurate."""
+
+FOLLOWUP_INSTRUCTIONS = PERSONA + """
+
+Reply to the user's latest message, based on the conversation so far and the current information about the user's age, sex, symptoms and diagnosis, given at the end.
+
+Decide on the best follow-up action:
+1. If the user provided new symptoms, acknowledge them and ask if there's anything else.
+2. If the user is asking general questions about their diagnosis, provide helpful, summarized information.
+3. If the user is ending the conversation (e.g., "bye", "thanks"), respond appropriately.
+4. If you need more information for a better diagnosis, ask relevant questions based on what's missing.
+5. If the user asks something you don't understand, politely ask for clarification."""
+
+HISTORY_SUMMARY_INSTRUCTIONS = """Summarize this conversation between a patient and HealthTalk, an AI medical assistant, in a few sentences.
+Keep the patient's age, sex, symptoms, the suggested condition and any advice given; drop greetings and small talk."""
+
+
+def extraction_messages(candidates: dict, user_text: str) -> list[dict]:
+    user_prompt = f"""Only use symptoms from this list:
+{json.dumps(candidates)}
+
+The user said: "{user_text}\""""
+    return [
+        {"role": "system", "content": EXTRACTION_INSTRUCTIONS},
+        {"role": "user", "content": user_prompt},
+    ]
+
+
+def diagnosis_summary_messages(top_condition: dict) -> list[dict]:
+    return [
+        {"role": "system", "content": DIAGNOSIS_SUMMARY_INSTRUCTIONS},
+        {"role": "user", "content": f"The user's top condition: {top_condition.get('common_name', 'unknown')}."},
+    ]
+
+
+def followup_messages(session: Session, history: list[dict]) -> list[dict]:
+    """
+    `history` is the windowed chat history, ending with the user's latest message.
+    """
+    conditions = ", ".join(f"{c.common_name} ({c.probability:.0%})" for c in session.conditions) or "N/A"
+    details = "; ".join(
+        f"{d.common_name}: severity {d.severity}, acuteness {d.acuteness}, triage {d.triage_level}" + (f", {d.hint}" if d.hint else "")
+        for d in session.condition_details
+    ) or "N/A"
+    answers = ", ".join(f"{e.name or e.id}: {e.choice_id}" for e in session.evidence) or "N/A"
+    context = f"""User Info: Age: {session.age}, Sex: {session.sex}, Symptoms: {session.symptoms}
+Answers to the diagnostic interview (if any): {answers}
+Current Diagnosis (if any): {conditions}
+Details of the top conditions (if any): {details}"""
+    return [{"role": "system", "content": FOLLOWUP_INSTRUCTIONS}] + history + [{"role": "system", "content": context}]
+
+
+def history_summary_messages(previous_summary: str | None, turns: list[Turn]) -> list[dict]:
+    transcript = "\n".join(f"{turn.role}: {turn.content}" for turn in turns)
+    return [
+        {"role": "system", "content": HISTORY_SUMMARY_INSTRUCTIONS},
+        {"role": "user", "content": f"Summary so far: {previous_summary or 'None'}\n\nNew messages:\n{transcript}"},
+    ]
@@ -0,0 +1,214 @@
+# core/resilience.py
+import asyncio
+import logging
+import math
+import random
+import sys
+import time
+from contextlib import asynccontextmanager
+
+import httpx
+from fastapi import HTTPException
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+def classify_failure(outcome) -> str | None:
+    """
+    Sorts the outcome of an upstream call (a response or an exception) into
+    "rejected" (the upstream never processed it, so any call can be retried),
+    "failed" (it may have been processed, so only idempotent calls are retried)
+    or None (a success, or an error that says nothing about the upstream's health).
+    """
+    if isinstance(outcome, httpx.Response):
+        if outcome.status_code in (429, 503):
+            return "rejected"
+        return "failed" if outcome.status_code >= 500 else None
+    if isinstance(outcome, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)):
+        return "rejected"
+    if isinstance(outcome, (asyncio.TimeoutError, httpx.TransportError)):
+        return "failed"
+
+    # openai is imported lazily (see core/clients.py); if it isn't loaded yet,
+    # the outcome can't be one of its errors.
+    openai = sys.modules.get("openai")
+    if openai is not None:
+        if isinstance(outcome, openai.RateLimitError):
+            return "rejected"
+        if isinstance(outcome, (openai.APIConnectionError, openai.InternalServerError)):
+            return "failed"
+    return None
+
+
+def _is_timeout(error: BaseException) -> bool:
+    openai = sys.modules.get("openai")
+    return isinstance(error, (asyncio.TimeoutError, httpx.TimeoutException)) or (
+        openai is not None and isinstance(error, openai.APITimeoutError)
+    )
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures, so calls fail fast
+    while an upstream is degraded. After `reset_seconds` a single trial call is
+    let through: success closes the breaker again, failure re-opens it.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_seconds: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        if self.state == "open":
+            if time.monotonic() - self._opened_at < self.reset_seconds:
+                return False
+            self.state = "half_open"
+        if self._trial_in_flight:
+            return False
+        self._trial_in_flight = True
+        return True
+
+    def record_success(self):
+        self.state = "closed"
+        self._failures = 0
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self._failures += 1
+        self._trial_in_flight = False
+        if self.state == "half_open" or self._failures >= self.failure_threshold:
+            if self.state != "open":
+                logger.warning("%s circuit breaker opened after %s failures", self.name, self._failures)
+            self.state = "open"
+            self._opened_at = time.monotonic()
+
+    def retry_after(self) -> float:
+        """
+        Seconds until an open breaker lets a trial call through; 0 otherwise.
+        """
+        if self.state != "open":
+            return 0.0
+        return max(self.reset_seconds - (time.monotonic() - self._opened_at), 0.0)
+
+    def abandon(self):
+        # A cancelled trial call says nothing either way; let the next one try.
+        self._trial_in_flight = False
+
+
+class Upstream:
+    """
+    Wraps every call to one upstream service with a per-endpoint timeout,
+    jittered exponential-backoff retries, a circuit breaker and a bulkhead
+    (a cap on concurrent calls), so a slow dependency can't tie up the worker.
+    Final failures are raised as HTTPException: 503 when shedding load or the
+    breaker is open, 504 on timeouts and 502 otherwise. Responses with an error
+    status are returned as they are for the caller to report.
+    """
+
+    def __init__(self, name: str, max_concurrency: int, breaker: CircuitBreaker):
+        self.name = name
+        self.breaker = breaker
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self.metrics = {"calls": 0, "retries": 0, "failures": 0, "short_circuited": 0, "shed": 0}
+
+    @asynccontextmanager
+    async def _slot(self):
+        try:
+            await asyncio.wait_for(self._slots.acquire(), settings.UPSTREAM_QUEUE_SECONDS)
+        except asyncio.TimeoutError:
+            self.metrics["shed"] += 1
+            raise HTTPException(status_code=503, detail=f"{self.name} is overloaded, please try again shortly")
+        try:
+            yield
+        finally:
+            self._slots.release()
+
+    async def _attempts(self, endpoint: str, send, idempotent: bool):
+        timeout = settings.UPSTREAM_TIMEOUTS.get(endpoint, settings.UPSTREAM_DEFAULT_TIMEOUT_SECONDS)
+        for attempt in range(settings.UPSTREAM_RETRIES + 1):
+            if not self.breaker.allow():
+                self.metrics["short_circuited"] += 1
+                retry_after = max(math.ceil(self.breaker.retry_after()), 1)
+                raise HTTPException(
+                    status_code=503, detail=f"{self.name} is unavailable, please try again shortly", headers={"Retry-After": str(retry_after)},
+                )
+
+            self.metrics["calls"] += 1
+            try:
+                outcome = await asyncio.wait_for(send(timeout), timeout)
+            except asyncio.CancelledError:
+                self.breaker.abandon()
+                raise
+            except Exception as e:
+                outcome = e
+
+            failure = classify_failure(outcome)
+            if failure is None:
+                self.breaker.record_success()
+                if isinstance(outcome, Exception):
+                    raise outcome
+                return outcome
+
+            self.breaker.record_failure()
+            self.metrics["failures"] += 1
+            if attempt == settings.UPSTREAM_RETRIES or not (idempotent or failure == "rejected"):
+                break
+            self.metrics["retries"] += 1
+            await asyncio.sleep(random.uniform(0, settings.UPSTREAM_RETRY_BASE_SECONDS * 2 ** attempt))
+
+        if isinstance(outcome, httpx.Response):
+            return outcome
+        logger.warning("%s call %s failed: %r", self.name, endpoint, outcome)
+        raise HTTPException(status_code=504 if _is_timeout(outcome) else 502, detail=f"{self.name} request failed") from outcome
+
+    async def call(self, endpoint: str, send, *, idempotent: bool = False):
+        """
+        Runs `send(timeout)`, an awaitable factory, under this upstream's
+        protections. Only idempotent calls are retried after they may have
+        reached the upstream; any call is retried when it was rejected outright.
+        """
+        async with self._slot():
+            return await self._attempts(endpoint, send, idempotent)
+
+    async def stream(self, endpoint: str, send, *, idempotent: bool = False):
+        """
+        Like call(), for a streamed response (an OpenAI AsyncStream): yields its
+        items and keeps the bulkhead slot until the stream is consumed. Only opening the stream is
+        retried; a failure mid-stream is raised.
+        """
+        async with self._slot():
+            stream = await self._attempts(endpoint, send, idempotent)
+            try:
+                async for item in stream:
+                    yield item
+            except Exception as e:
+                if classify_failure(e) is None:
+                    raise
+                self.breaker.record_failure()
+                self.metrics["failures"] += 1
+                logger.warning("%s stream %s failed: %r", self.name, endpoint, e)
+                raise HTTPException(status_code=504 if _is_timeout(e) else 502, detail=f"{self.name} request failed") from e
+            finally:
+                # Release the connection even if the consumer stops early
+                await stream.close()
+
+
+infermedica_upstream = Upstream(
+    "Infermedica",
+    settings.INFERMEDICA_MAX_CONCURRENCY,
+    CircuitBreaker("Infermedica", settings.BREAKER_FAILURE_THRESHOLD, settings.BREAKER_RESET_SECONDS),
+)
+openai_upstream = Upstream(
+    "OpenAI",
+    settings.OPENAI_MAX_CONCURRENCY,
+    CircuitBreaker("OpenAI", settings.BREAKER_FAILURE_THRESHOLD, settings.BREAKER_RESET_SECONDS),
+)
@@ -0,0 +1,119 @@
+# core/routing.py
+import logging
+import math
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+from fastapi import HTTPException
+
+from config.settings import LLMRoute, settings
+from core.telemetry import metrics
+
+logger = logging.getLogger(__name__)
+
+llm_calls = metrics.counter("healthtalk_llm_calls_total", "LLM calls by task, model and route (primary or fallback).")
+llm_latency = metrics.histogram(
+    "healthtalk_llm_latency_seconds",
+    "LLM latency as the model router judges it (time to first token for streamed tasks), by task and model.",
+)
+
+
+@dataclass(frozen=True, slots=True)
+class Route:
+    task: str
+    model: str
+    max_tokens: int | None
+    temperature: float | None
+    fallback: bool
+
+    @property
+    def params(self) -> dict:
+        """
+        Keyword arguments for chat.completions.create.
+        """
+        params = {"model": self.model}
+        if self.max_tokens is not None:
+            params["max_tokens"] = self.max_tokens
+        if self.temperature is not None:
+            params["temperature"] = self.temperature
+        return params
+
+
+class ModelRouter:
+    """
+    Picks the model each LLM task runs on. A task normally runs on its primary
+    model; once a full window of `window` primary calls has a p90 latency
+    over the task's SLO, it moves to its fallback model for
+    `fallback_seconds`, after which the primary gets a fresh window to prove
+    itself on.
+
+    `route` only decides; calls are counted by `started`, so a route whose
+    response comes from a cache costs nothing in the metrics.
+    """
+
+    def __init__(self, routes: dict[str, LLMRoute], window: int, fallback_seconds: float):
+        self.routes = routes
+        self.window = window
+        self.fallback_seconds = fallback_seconds
+        self._latencies = {}  # task --> recent primary latencies
+        self._fallback_until = {}  # task --> monotonic time the fallback ends
+        self.metrics = {"fallbacks": 0, "recoveries": 0}
+
+    def route(self, task: str) -> Route:
+        config = self.routes[task]
+        until = self._fallback_until.get(task)
+        if until is not None and time.monotonic() >= until:
+            del self._fallback_until[task]
+            self.metrics["recoveries"] += 1
+            logger.info("LLM task %s is back on %s", task, config.model)
+            until = None
+        fallback = until is not None
+        return Route(task, config.fallback_model if fallback else config.model, config.max_tokens, config.temperature, fallback)
+
+    def started(self, route: Route):
+        llm_calls.inc(task=route.task, model=route.model, route="fallback" if route.fallback else "primary")
+
+    def observe(self, route: Route, seconds: float):
+        llm_latency.observe(seconds, task=route.task, model=route.model)
+        config = self.routes[route.task]
+        if route.fallback or not config.fallback_model or config.latency_slo_seconds is None:
+            return
+        latencies = self._latencies.setdefault(route.task, deque(maxlen=self.window))
+        latencies.append(seconds)
+        if len(latencies) < self.window:
+            return
+        p90 = sorted(latencies)[math.ceil(self.window * 0.9) - 1]  # nearest rank
+        if p90 > config.latency_slo_seconds:
+            logger.warning(
+                "LLM task %s: p90 latency %.2fs on %s is over its %.2fs SLO, using %s for %ss",
+                route.task, p90, config.model, config.latency_slo_seconds, config.fallback_model, self.fallback_seconds,
+            )
+            self._fallback_until[route.task] = time.monotonic() + self.fallback_seconds
+            self.metrics["fallbacks"] += 1
+            latencies.clear()
+
+    @contextmanager
+    def timed(self, route: Route):
+        """
+        Counts the call and observes how long the block takes. Calls that time
+        out count too, at the time they gave up after; other failures say
+        nothing about latency.
+        """
+        self.started(route)
+        start = time.perf_counter()
+        try:
+            yield
+        except HTTPException as e:
+            if e.status_code == 504:
+                self.observe(route, time.perf_counter() - start)
+            raise
+        self.observe(route, time.perf_counter() - start)
+
+    def fallback_active(self) -> dict:
+        now = time.monotonic()
+        return {task: int(self._fallback_until.get(task, 0) > now) for task in self.routes}
+
+
+model_router = ModelRouter(settings.LLM_ROUTES, settings.LLM_LATENCY_WINDOW, settings.LLM_FALLBACK_SECONDS)
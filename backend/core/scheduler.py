@@ -0,0 +1,87 @@
+# core/scheduler.py
+import asyncio
+import logging
+
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+_REQUIRED = object()
+
+# Background tasks outlive the turn that started them; keep references so they
+# aren't garbage collected mid-flight.
+_background_tasks = set()
+
+
+class TurnScheduler:
+    """
+    Runs the upstream calls of one conversation turn.
+
+    Calls are started as soon as the turn knows it needs them and awaited
+    only where their results are used, so independent calls overlap instead
+    of running back to back. Every call can have its own deadline. Calls
+    still pending when the turn ends are cancelled, except background ones
+    (e.g. prefetches meant for the next turn), which are left to finish.
+
+        async with TurnScheduler() as turn:
+            for condition_id in top_conditions:
+                turn.start(f"condition:{condition_id}", lambda: get_condition_details(...), deadline=5)
+            ...  # stream the summary meanwhile
+            details = await turn.results("condition:", default=None)
+    """
+
+    def __init__(self):
+        self._tasks = {}
+        self._deadlines = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        for task in self._tasks.values():
+            if not task.done() and task not in _background_tasks:
+                task.cancel()
+
+    def start(self, name: str, fn, *, deadline: float | None = None, background: bool = False):
+        """
+        Schedules `fn` (a callable returning an awaitable) under `name`.
+        """
+        task = asyncio.create_task(asyncio.wait_for(fn(), deadline), name=name)
+        self._tasks[name] = task
+        self._deadlines[name] = deadline
+        if background:
+            _background_tasks.add(task)
+            task.add_done_callback(_finish_background_task)
+        return task
+
+    async def result(self, name: str, default=_REQUIRED):
+        """
+        Waits for the call named `name`. Without a `default`, failures are
+        raised (a missed deadline as a 504); with one, they are logged and the
+        default is returned instead, which suits optional enrichment calls.
+        """
+        try:
+            return await self._tasks[name]
+        except asyncio.TimeoutError:
+            if default is not _REQUIRED:
+                logger.warning("%s missed its %ss deadline", name, self._deadlines[name])
+                return default
+            raise HTTPException(status_code=504, detail=f"Upstream call '{name}' timed out")
+        except Exception as e:
+            if default is not _REQUIRED and not isinstance(e, asyncio.CancelledError):
+                logger.warning("%s failed: %s", name, e)
+                return default
+            raise
+
+    async def results(self, prefix: str, default=_REQUIRED) -> list:
+        """
+        Waits for every call whose name starts with `prefix`, concurrently.
+        """
+        names = [name for name in self._tasks if name.startswith(prefix)]
+        return list(await asyncio.gather(*(self.result(name, default) for name in names)))
+
+
+def _finish_background_task(task: asyncio.Task):
+    _background_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning("Background call %s failed: %s", task.get_name(), task.exception())
@@ -0,0 +1,456 @@
+# core/sessions.py
+import asyncio
+import hashlib
+import json
+import sqlite3
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+
+from config.settings import settings
+from core.demographics import age_in_years
+
+# Version tag of the compact serialized form; bump it when the layout changes.
+COMPACT_FORMAT = 3
+ROLE_CODES = {"patient": "p", "assistant": "a"}
+CODE_ROLES = {code: role for role, code in ROLE_CODES.items()}
+
+
+@dataclass(slots=True)
+class Turn:
+    role: str
+    content: str
+
+
+@dataclass(slots=True)
+class Condition:
+    id: str
+    common_name: str
+    probability: float
+
+
+@dataclass(slots=True)
+class ConditionDetails:
+    id: str
+    common_name: str | None
+    severity: str | None
+    acuteness: str | None
+    triage_level: str | None
+    hint: str | None
+
+
+@dataclass(slots=True)
+class Evidence:
+    id: str
+    choice_id: str  # "present", "absent" or "unknown"
+    # The item's name as the question showed it, for prompts; not sent to Infermedica
+    name: str | None = field(default=None, compare=False)
+
+
+@dataclass(slots=True)
+class QuestionItem:
+    id: str
+    name: str
+
+
+@dataclass(slots=True)
+class Question:
+    """
+    A question from Infermedica's interview: "single" (one yes/no item),
+    "group_single" (pick the one item that applies) or "group_multiple"
+    (any number of the items apply).
+    """
+
+    type: str
+    text: str
+    items: list[QuestionItem]
+
+
+@dataclass(slots=True)
+class Session:
+    """
+    Conversation state for one chat session. Slotted, and shares its repeated
+    strings (roles, symptom IDs) through interning, since tens of thousands
+    of these can be live per worker. Only what later turns need is kept:
+    symptom IDs rather than names, and Infermedica's ranked conditions rather
+    than its whole diagnosis response.
+    """
+
+    age: int | None = None
+    age_unit: str = "year"
+    sex: str | None = None
+    symptoms: list[str] = field(default_factory=list)  # symptom IDs
+    evidence: list[Evidence] = field(default_factory=list)  # answers to interview questions
+    question: Question | None = None  # the interview question awaiting an answer
+    questions_asked: int = 0
+    chat_history: list[Turn] = field(default_factory=list)
+    history_summary: str | None = None  # running summary of turns dropped from chat_history
+    is_diagnosed: bool = False
+    conditions: list[Condition] = field(default_factory=list)
+    condition_details: list[ConditionDetails] = field(default_factory=list)
+    current_state: str = "initial_gathering"
+
+    @property
+    def age_years(self) -> int | None:
+        return age_in_years(self.age, self.age_unit) if self.age is not None else None
+
+    @property
+    def age_payload(self) -> dict:
+        """
+        The age as Infermedica expects it.
+        """
+        return {"value": self.age, "unit": self.age_unit}
+
+    def add_turn(self, role: str, content: str):
+        self.chat_history.append(Turn(sys.intern(role), content))
+
+    def add_symptoms(self, symptom_ids: list[str]):
+        """
+        Adds newly found symptom IDs to the ones already captured, keeping order.
+        """
+        for symptom_id in symptom_ids:
+            if symptom_id not in self.symptoms:
+                self.symptoms.append(sys.intern(symptom_id))
+
+    def add_evidence(self, evidence: list[Evidence]):
+        """
+        Records interview answers; a later answer about the same item replaces the earlier one.
+        """
+        answered = {e.id for e in evidence}
+        self.evidence = [e for e in self.evidence if e.id not in answered]
+        self.evidence.extend(Evidence(sys.intern(e.id), sys.intern(e.choice_id), e.name) for e in evidence)
+
+    def to_compact(self) -> str:
+        """
+        Positional JSON: about half the size of the equivalent JSON object.
+        """
+        return json.dumps([
+            COMPACT_FORMAT,
+            self.age,
+            self.age_unit,
+            self.sex,
+            self.symptoms,
+            [[e.id, e.choice_id, e.name] for e in self.evidence],
+            [self.question.type, self.question.text, [[i.id, i.name] for i in self.question.items]] if self.question else None,
+            self.questions_asked,
+            [[ROLE_CODES.get(turn.role, turn.role), turn.content] for turn in self.chat_history],
+            self.history_summary,
+            self.is_diagnosed,
+            [[c.id, c.common_name, c.probability] for c in self.conditions],
+            [[d.id, d.common_name, d.severity, d.acuteness, d.triage_level, d.hint] for d in self.condition_details],
+            self.current_state,
+        ], separators=(",", ":"))
+
+    @classmethod
+    def from_compact(cls, data: str) -> "Session":
+        version, *fields = json.loads(data)
+        if version != COMPACT_FORMAT:
+            raise ValueError(f"Unknown session format: {version}")
+        (age, age_unit, sex, symptoms, evidence, question, questions_asked, history, history_summary,
+         is_diagnosed, conditions, condition_details, current_state) = fields
+        return cls(
+            age=age,
+            age_unit=sys.intern(age_unit),
+            sex=sys.intern(sex) if sex else None,
+            symptoms=[sys.intern(symptom_id) for symptom_id in symptoms],
+            evidence=[Evidence(sys.intern(symptom_id), sys.intern(choice_id), name) for symptom_id, choice_id, name in evidence],
+            question=Question(question[0], question[1], [QuestionItem(*item) for item in question[2]]) if question else None,
+            questions_asked=questions_asked,
+            chat_history=[Turn(sys.intern(CODE_ROLES.get(role, role)), content) for role, content in history],
+            history_summary=history_summary,
+            is_diagnosed=is_diagnosed,
+            conditions=[Condition(*c) for c in conditions],
+            condition_details=[ConditionDetails(*d) for d in condition_details],
+            current_state=sys.intern(current_state),
+        )
+
+
+class SessionStore(ABC):
+    """
+    Where conversation state lives between requests.
+
+    `get` returns the Session (or None), and `save` must be called after a
+    turn has mutated it. Every backend hands out a copy, so in-place changes
+    are only persisted by `save`, and a turn that fails halfway leaves the
+    stored session as it was. The methods are coroutines so that backends
+    doing I/O keep it off the event loop. Each instance keeps its own counters,
+    i.e. the metrics are per worker.
+    """
+
+    def __init__(self, ttl_seconds: int, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.metrics = {"hits": 0, "misses": 0, "expirations": 0, "evictions": 0}
+
+    @abstractmethod
+    async def get(self, session_id: str) -> Session | None:
+        ...
+
+    @abstractmethod
+    async def save(self, session_id: str, session: Session):
+        ...
+
+    @abstractmethod
+    async def delete(self, session_id: str):
+        ...
+
+    @abstractmethod
+    def __len__(self) -> int:
+        ...
+
+
+class MemorySessionStore(SessionStore):
+    """
+    In-process LRU with idle expiry. Sessions are kept in access order, so both
+    the least recently used and the longest idle sessions sit at the front.
+    `get` copies through the compact form, like the SQLite store does.
+    """
+
+    def __init__(self, ttl_seconds: int, max_entries: int):
+        super().__init__(ttl_seconds, max_entries)
+        self._sessions = OrderedDict()  # session_id --> (last_access, Session)
+
+    async def get(self, session_id: str) -> Session | None:
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            self.metrics["misses"] += 1
+            return None
+
+        last_access, session = entry
+        now = time.monotonic()
+        if now - last_access >= self.ttl_seconds:
+            del self._sessions[session_id]
+            self.metrics["expirations"] += 1
+            self.metrics["misses"] += 1
+            return None
+
+        self._sessions[session_id] = (now, session)
+        self._sessions.move_to_end(session_id)
+        self.metrics["hits"] += 1
+        return Session.from_compact(session.to_compact())
+
+    async def save(self, session_id: str, session: Session):
+        now = time.monotonic()
+        self._sessions[session_id] = (now, session)
+        self._sessions.move_to_end(session_id)
+
+        while self._sessions:
+            oldest_id, (last_access, _) = next(iter(self._sessions.items()))
+            if now - last_access >= self.ttl_seconds:
+                self.metrics["expirations"] += 1
+            elif len(self._sessions) > self.max_entries:
+                self.metrics["evictions"] += 1
+            else:
+                break
+            del self._sessions[oldest_id]
+
+    async def delete(self, session_id: str):
+        self._sessions.pop(session_id, None)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Out-of-process store backed by a SQLite file, so every uvicorn worker on a
+    host sees the same sessions and no sticky routing is needed. Sessions are
+    stored in their compact form with an absolute expiry that is pushed
+    forward on each save; rows in an older format are treated as missing.
+    Expiry is checked on every load, so an expired session is never served.
+    Expired rows are deleted, and the table is cut back to `max_entries`,
+    every PURGE_EVERY saves per worker. Between sweeps the table can hold up
+    to PURGE_EVERY - 1 rows over the cap per worker.
+
+    Queries run in worker threads (one connection per thread): while another
+    worker holds the write lock, a save waits up to the busy timeout without
+    stalling this worker's event loop.
+    """
+
+    PURGE_EVERY = 100  # saves between sweeps for expired and over-capacity rows
+    BUSY_TIMEOUT_SECONDS = 5.0
+
+    def __init__(self, path: str, ttl_seconds: int, max_entries: int):
+        super().__init__(ttl_seconds, max_entries)
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " session_id TEXT PRIMARY KEY,"
+            " data TEXT NOT NULL,"
+            " expires_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS sessions_expires_at ON sessions (expires_at)")
+        self._rows = conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+        self._saves = 0
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.BUSY_TIMEOUT_SECONDS, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _get(self, session_id: str) -> Session | None:
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT data, expires_at FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        if row is None:
+            self.metrics["misses"] += 1
+            return None
+
+        data, expires_at = row
+        if expires_at <= time.time():
+            conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            self.metrics["expirations"] += 1
+            self.metrics["misses"] += 1
+            return None
+
+        try:
+            session = Session.from_compact(data)
+        except (ValueError, TypeError):
+            self.metrics["misses"] += 1
+            return None
+        self.metrics["hits"] += 1
+        return session
+
+    def _save(self, data: str, session_id: str, purge: bool):
+        self._conn().execute(
+            "INSERT INTO sessions (session_id, data, expires_at) VALUES (?, ?, ?)"
+            " ON CONFLICT(session_id) DO UPDATE SET data = excluded.data, expires_at = excluded.expires_at",
+            (session_id, data, time.time() + self.ttl_seconds),
+        )
+        if purge:
+            self._purge()
+
+    def _purge(self):
+        """
+        Drops expired sessions, then the soonest-to-expire ones beyond `max_entries`.
+        """
+        conn = self._conn()
+        expired = conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (time.time(),)).rowcount
+        self.metrics["expirations"] += expired
+        overflow = conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0] - self.max_entries
+        if overflow > 0:
+            evicted = conn.execute(
+                "DELETE FROM sessions WHERE session_id IN"
+                " (SELECT session_id FROM sessions ORDER BY expires_at LIMIT ?)",
+                (overflow,),
+            ).rowcount
+            self.metrics["evictions"] += evicted
+        self._rows = conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    async def get(self, session_id: str) -> Session | None:
+        return await asyncio.to_thread(self._get, session_id)
+
+    async def save(self, session_id: str, session: Session):
+        self._saves += 1
+        await asyncio.to_thread(self._save, session.to_compact(), session_id, self._saves % self.PURGE_EVERY == 0)
+
+    async def delete(self, session_id: str):
+        await asyncio.to_thread(lambda: self._conn().execute("DELETE FROM sessions WHERE session_id = ?", (session_id,)))
+
+    async def purge(self):
+        await asyncio.to_thread(self._purge)
+
+    def __len__(self) -> int:
+        # As of the last sweep, so that reading the gauge never touches the file
+        return self._rows
+
+
+def create_session_store() -> SessionStore:
+    if settings.SESSION_BACKEND == "sqlite":
+        return SQLiteSessionStore(settings.SESSION_SQLITE_PATH, settings.SESSION_TTL_SECONDS, settings.SESSION_MAX_ENTRIES)
+    if settings.SESSION_BACKEND == "memory":
+        return MemorySessionStore(settings.SESSION_TTL_SECONDS, settings.SESSION_MAX_ENTRIES)
+    raise ValueError(f"Unknown SESSION_BACKEND: {settings.SESSION_BACKEND!r}")
+
+
+class SessionLocks:
+    """
+    One asyncio.Lock per session that has a turn running or waiting, so a
+    double-submitted or retried message waits for the turn already in flight
+    instead of mutating the same session alongside it. Locks only exist while
+    held or awaited. They are per worker: with several workers, requests for a
+    session must reach the same one for this to serialize them.
+    """
+
+    def __init__(self):
+        self._locks = {}  # session_id --> [asyncio.Lock, number of holders and waiters]
+        self.metrics = {"acquired": 0, "waited": 0}
+
+    @asynccontextmanager
+    async def hold(self, session_id: str):
+        entry = self._locks.setdefault(session_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        if entry[0].locked():
+            self.metrics["waited"] += 1
+        try:
+            async with entry[0]:
+                self.metrics["acquired"] += 1
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[session_id]
+
+
+class IdempotencyCache:
+    """
+    Replies of recent turns sent with an idempotency key, so a retry of the
+    same request gets the stored reply without running the turn again. Entries
+    expire after `ttl_seconds`; the cache is per worker and bounded to
+    `max_entries` (oldest first).
+    """
+
+    def __init__(self, ttl_seconds: int, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._replies = OrderedDict()  # (session_id, key) --> (expires_at, message digest, reply)
+        self.metrics = {"hits": 0, "misses": 0, "conflicts": 0, "stores": 0}
+
+    @staticmethod
+    def _digest(message: str) -> bytes:
+        return hashlib.sha256(message.encode("utf-8")).digest()
+
+    def get(self, session_id: str, key: str, message: str) -> str | None:
+        """
+        Returns the stored reply, or None if there is none. Raises ValueError
+        if the key was used for a different message.
+        """
+        entry = self._replies.get((session_id, key))
+        if entry is None or entry[0] <= time.monotonic():
+            self.metrics["misses"] += 1
+            return None
+        _, digest, reply = entry
+        if digest != self._digest(message):
+            self.metrics["conflicts"] += 1
+            raise ValueError("Idempotency key was already used for a different message.")
+        self.metrics["hits"] += 1
+        return reply
+
+    def set(self, session_id: str, key: str, message: str, reply: str):
+        now = time.monotonic()
+        self._replies[(session_id, key)] = (now + self.ttl_seconds, self._digest(message), reply)
+        self._replies.move_to_end((session_id, key))
+        self.metrics["stores"] += 1
+
+        # Every entry has the same TTL, so the expired ones are at the front.
+        while self._replies:
+            expires_at, _, _ = next(iter(self._replies.values()))
+            if expires_at > now and len(self._replies) <= self.max_entries:
+                break
+            self._replies.popitem(last=False)
+
+
+session_store = create_session_store()
+session_locks = SessionLocks()
+idempotency_cache = IdempotencyCache(settings.IDEMPOTENCY_TTL_SECONDS, settings.IDEMPOTENCY_MAX_ENTRIES)
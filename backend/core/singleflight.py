@@ -0,0 +1,95 @@
+# core/singleflight.py
+import asyncio
+
+
+class _Broadcast:
+    """
+    The chunks a shared stream has produced so far, replayed to every subscriber.
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.changed = asyncio.Event()
+
+    def publish(self):
+        # Wake everyone waiting on the current event, then start a fresh one.
+        changed, self.changed = self.changed, asyncio.Event()
+        changed.set()
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent calls: the first caller for a key starts the
+    work and everyone who asks for the same key while it is running shares its
+    result (or its exception) instead of starting another one.
+
+    The work runs in its own task, so a caller that disconnects or hits its
+    deadline doesn't cancel it for the others.
+    """
+
+    def __init__(self):
+        self._calls = {}  # key --> asyncio.Task
+        self._streams = {}  # key --> _Broadcast
+        self._pumps = set()  # keeps the stream tasks referenced until they finish
+        self.metrics = {"leaders": 0, "followers": 0}
+
+    async def do(self, key, fn):
+        """
+        Returns the result of `await fn()`, shared with concurrent callers of the same key.
+        """
+        task = self._calls.get(key)
+        if task is None:
+            self.metrics["leaders"] += 1
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t))
+        else:
+            self.metrics["followers"] += 1
+        return await asyncio.shield(task)
+
+    def _finish(self, key, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # mark it retrieved even if every caller went away
+
+    async def stream(self, key, fn):
+        """
+        Yields the chunks of the async generator `fn()`. Callers that join while
+        it is running get the chunks produced so far, then the rest as they arrive.
+        """
+        broadcast = self._streams.get(key)
+        if broadcast is None:
+            self.metrics["leaders"] += 1
+            broadcast = self._streams[key] = _Broadcast()
+            pump = asyncio.ensure_future(self._pump(key, fn, broadcast))
+            self._pumps.add(pump)
+            pump.add_done_callback(self._pumps.discard)
+        else:
+            self.metrics["followers"] += 1
+
+        position = 0
+        while True:
+            changed = broadcast.changed
+            while position < len(broadcast.chunks):
+                yield broadcast.chunks[position]
+                position += 1
+            if broadcast.done:
+                if broadcast.error is not None:
+                    raise broadcast.error
+                return
+            await changed.wait()
+
+    async def _pump(self, key, fn, broadcast: _Broadcast):
+        try:
+            async for chunk in fn():
+                broadcast.chunks.append(chunk)
+                broadcast.publish()
+        except Exception as e:
+            broadcast.error = e
+        finally:
+            broadcast.done = True
+            broadcast.publish()
+            del self._streams[key]
@@ -0,0 +1,187 @@
+# core/snapshot.py
+# A single read-only file holding the Infermedica catalogs a worker needs
+# (symptoms and conditions per age bucket) and the symptom vector indexes
+# built from them, written by `manage.py snapshot-catalogs`. Workers map it
+# at startup instead of fetching from Infermedica, so a cold worker serves
+# without touching the network. The index matrices are used straight from
+# the mapping, so every worker on a host shares one copy in the page cache.
+#
+# Layout: a fixed header (magic, format version, metadata length), the
+# metadata as JSON, then the blobs it points to, each 64-byte aligned. Blob
+# offsets in the metadata are relative to the start of the blobs.
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import time
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"HTSNAP\0\0"
+FORMAT_VERSION = 1
+_HEADER = struct.Struct("<8sIQ")  # magic, format version, metadata length
+_ALIGN = 64
+
+
+def _data_start(meta_length: int) -> int:
+    end = _HEADER.size + meta_length
+    return end + -end % _ALIGN
+
+
+class CatalogSnapshot:
+    """
+    A mapped snapshot file. Catalogs are parsed when first asked for; index
+    matrices are numpy views onto the mapping (numpy is only imported then).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.file_id = (stat.st_ino, stat.st_mtime_ns)
+
+        magic, version, meta_length = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a version {FORMAT_VERSION} catalog snapshot")
+        meta = json.loads(self._mm[_HEADER.size:_HEADER.size + meta_length])
+        self._data_start = _data_start(meta_length)
+        self.version = meta["version"]
+        self.created_at = meta["created_at"]
+        self.embedding_dim = meta["embedding_dim"]
+        self._buckets = {int(bucket): entry for bucket, entry in meta["buckets"].items()}
+
+    @property
+    def buckets(self) -> list[int]:
+        return sorted(self._buckets)
+
+    def _json(self, blob: list[int]):
+        offset, length = blob
+        start = self._data_start + offset
+        return json.loads(self._mm[start:start + length])
+
+    def symptoms(self, bucket: int) -> tuple[list[dict], str | None] | None:
+        """
+        The bucket's symptom catalog and its ETag, or None if it isn't in the snapshot.
+        """
+        entry = self._buckets.get(bucket)
+        if entry is None:
+            return None
+        return self._json(entry["symptoms"]), entry["etag"]
+
+    def conditions(self, bucket: int) -> list[dict] | None:
+        entry = self._buckets.get(bucket)
+        return self._json(entry["conditions"]) if entry is not None and entry["conditions"] else None
+
+    def embedding_index(self, bucket: int, fingerprint: str):
+        """
+        The bucket's symptom vector index if it was built from the same
+        catalog, synonyms and dimension (see core/embeddings.py), else None.
+        """
+        import numpy as np
+
+        from core.embeddings import EmbeddingIndex
+
+        entry = self._buckets.get(bucket)
+        index = entry and entry["index"]
+        if not index or index["fingerprint"] != fingerprint:
+            return None
+        rows = len(index["row_ids"])
+        matrix = np.frombuffer(self._mm, dtype="<f4", count=self.embedding_dim * rows, offset=self._data_start + index["matrix"][0])
+        return EmbeddingIndex(index["row_ids"], matrix.reshape(self.embedding_dim, rows), fingerprint)
+
+
+def write_snapshot(path: str, buckets: dict[int, dict], embedding_dim: int) -> str:
+    """
+    Writes a snapshot and atomically replaces `path` with it. `buckets` maps
+    each age bucket to {"symptoms", "etag", "conditions", "index"}, where
+    "index" is an EmbeddingIndex or None. Returns the snapshot's version.
+    """
+    blobs = []  # (offset, bytes)
+    offset = 0
+
+    def add(data: bytes) -> list[int]:
+        nonlocal offset
+        offset += -offset % _ALIGN
+        blobs.append((offset, data))
+        offset += len(data)
+        return [blobs[-1][0], len(data)]
+
+    version = hashlib.sha256()
+    meta_buckets = {}
+    for bucket, entry in sorted(buckets.items()):
+        symptoms = json.dumps(entry["symptoms"], separators=(",", ":")).encode("utf-8")
+        conditions = json.dumps(entry["conditions"], separators=(",", ":")).encode("utf-8") if entry.get("conditions") else None
+        index = entry.get("index")
+        meta_buckets[str(bucket)] = {
+            "etag": entry.get("etag"),
+            "symptoms": add(symptoms),
+            "conditions": add(conditions) if conditions else None,
+            "index": {
+                "fingerprint": index.fingerprint,
+                "row_ids": index.row_ids,
+                "matrix": add(index.matrix.astype("<f4", copy=False).tobytes()),
+            } if index is not None else None,
+        }
+        version.update(symptoms)
+        version.update(conditions or b"")
+        version.update((index.fingerprint if index is not None else "").encode())
+
+    meta = {
+        "version": version.hexdigest()[:16],
+        "created_at": time.time(),
+        "embedding_dim": embedding_dim,
+        "buckets": meta_buckets,
+    }
+    meta_bytes = json.dumps(meta, separators=(",", ":")).encode("utf-8")
+    data_start = _data_start(len(meta_bytes))
+
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    # Write to a temp file and rename: workers still mapping the old file
+    # keep reading it, and the next one to look picks up the new one.
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, len(meta_bytes)))
+        f.write(meta_bytes)
+        for blob_offset, data in blobs:
+            f.seek(data_start + blob_offset)
+            f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.chmod(tmp_path, 0o644)
+    os.replace(tmp_path, path)
+    return meta["version"]
+
+
+_current = None  # CatalogSnapshot
+_rejected = None  # (inode, mtime) of a file that failed to load, so it is only reported once
+
+
+def current_snapshot() -> CatalogSnapshot | None:
+    """
+    The snapshot at CATALOG_SNAPSHOT_PATH, remapped when the file has been
+    replaced since it was last looked at (a stat per call). None when no
+    snapshot is configured or it can't be read.
+    """
+    global _current, _rejected
+    if not settings.CATALOG_SNAPSHOT_PATH:
+        return None
+    try:
+        stat = os.stat(settings.CATALOG_SNAPSHOT_PATH)
+    except OSError:
+        return _current
+    file_id = (stat.st_ino, stat.st_mtime_ns)
+    if file_id != _rejected and (_current is None or _current.file_id != file_id):
+        try:
+            _current = CatalogSnapshot(settings.CATALOG_SNAPSHOT_PATH)
+            logger.info("Mapped catalog snapshot %s (version %s)", settings.CATALOG_SNAPSHOT_PATH, _current.version)
+        except (OSError, ValueError, KeyError, struct.error) as e:
+            _rejected = file_id
+            logger.error("Unreadable catalog snapshot %s: %s", settings.CATALOG_SNAPSHOT_PATH, e)
+    return _current
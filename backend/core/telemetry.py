@@ -0,0 +1,180 @@
+# core/telemetry.py
+import bisect
+import contextvars
+import logging
+import time
+from contextlib import contextmanager
+
+from config.settings import settings
+from core.sessions import Session
+
+# Set per HTTP request by the middleware in main.py and attached to every log record.
+request_id_var = contextvars.ContextVar("request_id", default="-")
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self._values = {}  # sorted label items --> value
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(tuple(sorted(labels.items())), 0)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_format_labels(key)} {value}" for key, value in self._values.items()]
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self._series = {}  # sorted label items --> [per-bucket counts..., +Inf count, sum]
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for key, series in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(key + (('le', bound),))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {series[-1]}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    In-process metrics rendered in the Prometheus text format. Besides its own
+    counters and histograms, it exports the counters other components already
+    keep (caches, session store) through registered sources, read at scrape time.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._sources = []  # (name, help, callable returning {label value: number}, label name)
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        metric = Counter(name, help_text)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help_text: str, buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, help_text, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_source(self, name: str, help_text: str, read, label: str = "event"):
+        self._sources.append((name, help_text, read, label))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines += metric.render()
+        for name, help_text, read, label in self._sources:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+            lines += [f'{name}{{{label}="{_escape(key)}"}} {value}' for key, value in read().items()]
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+stage_duration = metrics.histogram("healthtalk_stage_duration_seconds", "Duration of each stage of a chat turn, including upstream calls.")
+stage_errors = metrics.counter("healthtalk_stage_errors_total", "Stages that raised an error.")
+llm_tokens = metrics.counter("healthtalk_llm_tokens_total", "LLM tokens used, by stage and kind (prompt/cached/completion; cached tokens are part of prompt).")
+llm_cost = metrics.counter("healthtalk_llm_cost_usd_total", "Estimated LLM spend in USD, by stage and model (see LLM_PRICES).")
+extraction_rejections = metrics.counter("healthtalk_extraction_rejections_total", "Symptom IDs or outputs from the extraction LLM that failed validation.")
+state_transitions = metrics.counter("healthtalk_state_transitions_total", "Conversation state changes.")
+http_duration = metrics.histogram("healthtalk_http_request_duration_seconds", "HTTP request duration by route.")
+
+
+@contextmanager
+def span(stage: str):
+    """
+    Times a stage of the turn into healthtalk_stage_duration_seconds.
+    Costs a couple of perf_counter calls and a bisect, so it is safe to wrap
+    every upstream call with.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        stage_errors.inc(stage=stage)
+        raise
+    finally:
+        stage_duration.observe(time.perf_counter() - start, stage=stage)
+
+
+_prompt_stages = set()  # stages that have reported token usage
+
+
+def record_usage(stage: str, usage, model: str):
+    """
+    Records the token usage reported on an OpenAI response (or final stream
+    chunk), and what it cost at the model's LLM_PRICES.
+    """
+    if usage is None:
+        return
+    llm_tokens.inc(usage.prompt_tokens, stage=stage, kind="prompt")
+    llm_tokens.inc(usage.completion_tokens, stage=stage, kind="completion")
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached_tokens = getattr(details, "cached_tokens", None) or 0
+    llm_tokens.inc(cached_tokens, stage=stage, kind="cached")
+    _prompt_stages.add(stage)
+
+    prices = settings.LLM_PRICES.get(model)
+    if prices:
+        cost = (usage.prompt_tokens - cached_tokens) * prices["prompt"] + cached_tokens * prices["cached"] + usage.completion_tokens * prices["completion"]
+        llm_cost.inc(cost / 1e6, stage=stage, model=model)
+
+
+def prompt_cache_hit_rate() -> dict:
+    """
+    Share of prompt tokens served from the provider's prompt cache, per stage.
+    """
+    return {
+        stage: round(llm_tokens.value(stage=stage, kind="cached") / prompt_tokens, 4)
+        for stage in sorted(_prompt_stages)
+        if (prompt_tokens := llm_tokens.value(stage=stage, kind="prompt"))
+    }
+
+
+metrics.register_source("healthtalk_prompt_cache_hit_ratio", "Share of prompt tokens served from the provider's prompt cache.", prompt_cache_hit_rate, label="stage")
+
+
+def record_transition(session: Session, new_state: str):
+    state_transitions.inc(**{"from": session.current_state, "to": new_state})
+    session.current_state = new_state
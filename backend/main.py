@@ -1,13 +1,78 @@
 # main.py
-from fastapi import FastAPI
+import asyncio
+import logging
+import time
+import uuid
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from api.chat import router as chat_router
+from api.diagnosis import router as diagnosis_router
 from config.settings import settings # Import your settings
+from core.admission import chat_admission
+from core.catalog import symptom_catalog
+from core.clients import close_clients
+from core.completion_cache import completion_cache
+from core.logic import condition_flights, summary_flights
+from core.resilience import infermedica_upstream, openai_upstream
+from core.routing import model_router
+from core.sessions import idempotency_cache, session_locks, session_store
+from core.telemetry import RequestIdFilter, http_duration, metrics, request_id_var
+
+# Every log line carries the ID of the request it was written for
+log_handler = logging.StreamHandler()
+log_handler.addFilter(RequestIdFilter())
+log_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s"))
+logging.basicConfig(level=logging.INFO, handlers=[log_handler])
+# httpx (and the copy bundled with openai) logs every upstream request at INFO;
+# the stage histograms already cover them
+for upstream_logger in ("httpx", "httpx2"):
+    logging.getLogger(upstream_logger).setLevel(logging.WARNING)
+
+# Export the counters the caches and the session store already keep
+metrics.register_source("healthtalk_symptom_catalog_events", "Symptom catalog cache events.", lambda: symptom_catalog.metrics)
+metrics.register_source("healthtalk_session_store_events", "Session store events.", lambda: session_store.metrics)
+metrics.register_source("healthtalk_session_lock_events", "Chat turns admitted per session, and how many had to wait for one in flight.", lambda: session_locks.metrics)
+metrics.register_source("healthtalk_idempotency_cache_events", "Lookups of stored replies for retried chat requests.", lambda: idempotency_cache.metrics)
+metrics.register_source("healthtalk_completion_cache_events", "Completion cache events.", lambda: completion_cache.metrics)
+metrics.register_source("healthtalk_infermedica_upstream_events", "Calls to Infermedica through the resilience layer.", lambda: infermedica_upstream.metrics)
+metrics.register_source("healthtalk_openai_upstream_events", "Calls to OpenAI through the resilience layer.", lambda: openai_upstream.metrics)
+metrics.register_source("healthtalk_condition_lookup_flights", "Condition detail lookups started (leaders) or shared (followers).", lambda: condition_flights.metrics, label="role")
+metrics.register_source("healthtalk_summary_flights", "Diagnosis summary streams started (leaders) or shared (followers).", lambda: summary_flights.metrics, label="role")
+metrics.register_source(
+    "healthtalk_circuit_open", "1 while an upstream's circuit breaker is open or half-open.",
+    lambda: {upstream.name: int(upstream.breaker.state != "closed") for upstream in (infermedica_upstream, openai_upstream)},
+    label="upstream",
+)
+metrics.register_source(
+    "healthtalk_chat_turns", "Chat turns running and waiting for a slot in this worker.",
+    lambda: {"active": chat_admission.active, "queued": chat_admission.waiting}, label="state",
+)
+metrics.register_source("healthtalk_llm_router_events", "LLM tasks moved to their fallback model over latency, and moved back.", lambda: model_router.metrics)
+metrics.register_source("healthtalk_llm_fallback_active", "1 while an LLM task runs on its fallback model.", model_router.fallback_active, label="task")
+metrics.register_source("healthtalk_sessions", "Sessions held by this worker.", lambda: {"active": len(session_store)}, label="state")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Clients are created on first use. Catalogs come from the snapshot when
+    # there is one; otherwise the busiest age buckets are loaded in the
+    # background, so the worker takes traffic right away, and requests that
+    # need a bucket before it arrives share the same fetch.
+    symptom_catalog.load_snapshot()
+    warm_up = asyncio.create_task(symptom_catalog.warm_up(settings.SYMPTOM_CATALOG_WARM_AGES))
+    yield
+    warm_up.cancel()
+    await close_clients()
+
 
 app = FastAPI(
     title="HealthTalk Medical Assistant API",
     description="Backend for an AI-powered medical assistant.",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
 # Configure CORS using settings
@@ -21,7 +86,31 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+@app.middleware("http")
+async def request_context(request: Request, call_next):
+    # Reuse the caller's request ID when there is one, so logs can be joined across services
+    request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex
+    token = request_id_var.set(request_id)
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        request_id_var.reset(token)
+    # Label by route template, not raw path, to keep the number of series bounded.
+    # For /chat/stream this is the time until the first frame, the body streams afterwards.
+    route = request.scope.get("route")
+    http_duration.observe(time.perf_counter() - start, route=getattr(route, "path", "unmatched"), method=request.method)
+    response.headers["X-Request-ID"] = request_id
+    return response
+
+
 app.include_router(chat_router, prefix="/api")
+app.include_router(diagnosis_router, prefix="/api")
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def read_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 @app.get("/")
 async def read_root():
@@ -0,0 +1,154 @@
+# manage.py
+# Maintenance commands, run from the backend directory:
+#   python manage.py warm-summaries --limit 100
+#   python manage.py diagnose-batch cases.jsonl --output results.jsonl
+#   python manage.py build-symptom-index
+#   python manage.py snapshot-catalogs
+import argparse
+import asyncio
+import sys
+from contextlib import nullcontext
+
+from config.settings import settings
+from core.clients import infermedica_client, close_clients
+from core.completion_cache import completion_cache
+
+PREVALENCE_RANK = {"common": 0, "moderate": 1, "rare": 2, "very_rare": 3}
+
+
+async def warm_summaries(age: int, limit: int, concurrency: int):
+    """
+    Generates diagnosis summaries for the most prevalent conditions and stores
+    them in the on-disk completion cache, so workers serve them as cache hits.
+    """
+    from core.logic import summarize_diagnosis
+
+    if not completion_cache.disk_dir:
+        raise SystemExit("Set COMPLETION_CACHE_DIR so the warmed summaries are shared with the API workers.")
+
+    from core.catalog import symptom_catalog
+    from core.snapshot import current_snapshot
+
+    snapshot = current_snapshot()
+    conditions = snapshot.conditions(symptom_catalog.bucket_for_age(age)) if snapshot is not None else None
+    if conditions is None:
+        response = await infermedica_client().get("/conditions", params={"age.value": age})
+        response.raise_for_status()
+        conditions = response.json()
+    conditions = sorted(conditions, key=lambda c: PREVALENCE_RANK.get(c.get("prevalence"), len(PREVALENCE_RANK)))[:limit]
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def warm(condition: dict):
+        async with semaphore:
+            async for _ in summarize_diagnosis({"conditions": [condition]}):
+                pass
+            print(f"Warmed: {condition['common_name']}")
+
+    await asyncio.gather(*(warm(condition) for condition in conditions))
+    print(f"{len(conditions)} summaries in {completion_cache.disk_dir} ({completion_cache.metrics})")
+
+
+async def diagnose_batch(input_path: str, output_path: str, concurrency: int, summarize: bool):
+    """
+    Runs the cases in a JSONL file ({"age", "sex", "evidence"} per line) through
+    the same pipeline as POST /api/diagnosis/batch and writes JSONL results.
+    """
+    from core.batch import run_batch
+
+    failed = total = 0
+    with open(input_path) as cases, (open(output_path, "w") if output_path != "-" else nullcontext(sys.stdout)) as out:
+        async for result in run_batch(cases, concurrency, summarize):
+            out.write(result.model_dump_json(exclude_none=True) + "\n")
+            total += 1
+            failed += result.error is not None
+    print(f"{total} cases, {failed} failed", file=sys.stderr)
+
+
+async def build_symptom_index():
+    """
+    Builds the symptom vector index for every catalog age bucket into
+    EMBEDDING_INDEX_DIR, where the API workers memory-map it from.
+    """
+    from core.catalog import symptom_catalog
+    from core.embeddings import EmbeddingIndex, index_path, load_synonyms
+
+    if not settings.EMBEDDING_INDEX_DIR:
+        raise SystemExit("Set EMBEDDING_INDEX_DIR so the index is shared with the API workers.")
+
+    synonyms = load_synonyms(settings.SYMPTOM_SYNONYMS_PATH)
+    for bucket in symptom_catalog.age_thresholds:
+        catalog = await symptom_catalog.get(bucket)
+        index = EmbeddingIndex.build(catalog, synonyms, settings.EMBEDDING_DIM)
+        index.save(index_path(bucket))
+        print(f"Age {bucket}+: {len(index.ids)} symptoms, {len(index.row_ids)} labels --> {index_path(bucket)}.npy")
+
+
+async def snapshot_catalogs(path: str):
+    """
+    Fetches the symptom and condition catalogs for every age bucket, builds
+    their symptom indexes and atomically replaces the snapshot at `path`.
+    Running workers switch to it as their catalog entries expire; run it
+    more often than SYMPTOM_CATALOG_TTL_SECONDS so they never need to fetch.
+    """
+    from core.embeddings import EmbeddingIndex, load_synonyms
+    from core.snapshot import write_snapshot
+
+    synonyms = load_synonyms(settings.SYMPTOM_SYNONYMS_PATH)
+    buckets = {}
+    for bucket in sorted(settings.SYMPTOM_CATALOG_AGE_THRESHOLDS):
+        symptoms = await infermedica_client().get("/symptoms", params={"age.value": bucket})
+        symptoms.raise_for_status()
+        conditions = await infermedica_client().get("/conditions", params={"age.value": bucket})
+        conditions.raise_for_status()
+        buckets[bucket] = {
+            "symptoms": symptoms.json(),
+            "etag": symptoms.headers.get("ETag"),
+            "conditions": conditions.json(),
+            "index": EmbeddingIndex.build(symptoms.json(), synonyms, settings.EMBEDDING_DIM),
+        }
+        print(f"Age {bucket}+: {len(buckets[bucket]['symptoms'])} symptoms, {len(buckets[bucket]['conditions'])} conditions")
+
+    version = write_snapshot(path, buckets, settings.EMBEDDING_DIM)
+    print(f"Snapshot {version} written to {path}")
+
+
+async def run(args):
+    try:
+        if args.command == "warm-summaries":
+            await warm_summaries(args.age, args.limit, args.concurrency)
+        elif args.command == "diagnose-batch":
+            await diagnose_batch(args.input, args.output, args.concurrency, args.summarize)
+        elif args.command == "build-symptom-index":
+            await build_symptom_index()
+        elif args.command == "snapshot-catalogs":
+            await snapshot_catalogs(args.path)
+    finally:
+        await close_clients()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HealthTalk backend maintenance commands.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    warm = commands.add_parser("warm-summaries", help="Precompute diagnosis summaries for the most common conditions.")
+    warm.add_argument("--age", type=int, default=30, help="Age used to fetch the condition list from Infermedica.")
+    warm.add_argument("--limit", type=int, default=100, help="Number of conditions to summarize.")
+    warm.add_argument("--concurrency", type=int, default=8, help="Summaries generated in parallel.")
+
+    batch = commands.add_parser("diagnose-batch", help="Diagnose every case in a JSONL file.")
+    batch.add_argument("input", help="JSONL file with one {\"age\", \"sex\", \"evidence\"} case per line.")
+    batch.add_argument("--output", default="-", help="Where to write the JSONL results (default: stdout).")
+    batch.add_argument("--concurrency", type=int, default=settings.BATCH_CONCURRENCY, help="Cases diagnosed in parallel.")
+    batch.add_argument("--summarize", action="store_true", help="Also generate each case's diagnosis summary.")
+
+    commands.add_parser("build-symptom-index", help="Build the symptom vector index for each catalog age bucket.")
+
+    snapshot = commands.add_parser("snapshot-catalogs", help="Write the catalogs and symptom indexes to a snapshot file for the API workers.")
+    snapshot.add_argument("--path", default=settings.CATALOG_SNAPSHOT_PATH or "catalogs.snapshot", help="Snapshot file to replace (default: CATALOG_SNAPSHOT_PATH).")
+
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -7,10 +7,6 @@ import os
 import json
 import re
 
-from sklearn import datasets
-from sklearn.linear_model import LogisticRegression
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import accuracy_score
 
 load_dotenv()
 
@@ -253,7 +249,7 @@ def accuracy_testing(illness_dict):
     print(y_correct)
     print(y_pred)
 
-    accuracy = accuracy_score(y_true=y_correct, y_pred=y_pred)
+    accuracy = sum(correct == predicted for correct, predicted in zip(y_correct, y_pred)) / len(y_correct)
     formatted_accuracy = "{:.2f}%".format(accuracy*100)
 
     return formatted_accuracy
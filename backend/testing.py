@@ -7,10 +7,6 @@ import os
 import json
 import re
 
-from sklearn import datasets
-from sklearn.linear_model import LogisticRegression
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import accuracy_score
 
 load_dotenv()
 
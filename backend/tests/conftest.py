@@ -0,0 +1,7 @@
+# tests/conftest.py
+import os
+
+# Settings require credentials; the tests never reach the real upstreams.
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("INFERMEDICA_APP_ID", "test")
+os.environ.setdefault("INFERMEDICA_APP_KEY", "test")
@@ -0,0 +1,138 @@
+# tests/test_admission.py
+import asyncio
+import types
+
+import pytest
+from fastapi import HTTPException
+
+from config.settings import settings
+from core import admission
+from core.admission import ChatAdmission, RateLimiter, admissions
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(admission, "time", types.SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+@pytest.fixture
+def limits(monkeypatch):
+    monkeypatch.setattr(settings, "CHAT_SESSION_RATE", 0.5)
+    monkeypatch.setattr(settings, "CHAT_SESSION_BURST", 2)
+    monkeypatch.setattr(settings, "CHAT_CLIENT_RATE", 1.0)
+    monkeypatch.setattr(settings, "CHAT_CLIENT_BURST", 3)
+
+
+def test_bucket_allows_a_burst_then_says_when_to_retry(clock):
+    limiter = RateLimiter(rate=0.5, burst=2, max_keys=10)
+    assert limiter.acquire("a") == 0
+    assert limiter.acquire("a") == 0
+    assert limiter.acquire("a") == 2.0
+    assert limiter.acquire("b") == 0  # buckets are per key
+
+    clock[0] += 2
+    assert limiter.acquire("a") == 0
+    assert limiter.acquire("a") == 2.0
+
+
+def test_bucket_tracks_only_the_most_recent_keys(clock):
+    limiter = RateLimiter(rate=0.5, burst=1, max_keys=2)
+    for key in ("a", "b", "c"):
+        limiter.acquire(key)
+    assert len(limiter) == 2
+    assert limiter.acquire("a") == 0  # dropped, so back with a full bucket
+    assert limiter.acquire("c") == 2.0
+
+
+def test_session_over_its_rate_gets_429_with_retry_after(clock, limits):
+    gate = ChatAdmission(max_concurrency=10, max_queue=0, queue_seconds=1)
+    before = admissions.value(route="chat", outcome="session_rate_limited")
+
+    async def scenario():
+        for _ in range(2):
+            await gate.enter("chat", "s1", "client")
+            gate.leave()
+        await gate.enter("chat", "s1", "client")
+
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(scenario())
+    assert raised.value.status_code == 429
+    assert raised.value.headers == {"Retry-After": "2"}
+    assert admissions.value(route="chat", outcome="session_rate_limited") == before + 1
+
+
+def test_client_over_its_rate_gets_429_across_sessions(clock, limits):
+    gate = ChatAdmission(max_concurrency=10, max_queue=0, queue_seconds=1)
+    for session_id in ("s1", "s2", "s3"):
+        gate.check("init", session_id, "client")
+    with pytest.raises(HTTPException) as raised:
+        gate.check("init", "s4", "client")
+    assert raised.value.status_code == 429
+    assert raised.value.headers == {"Retry-After": "1"}
+
+
+def test_check_takes_no_slot(limits):
+    gate = ChatAdmission(max_concurrency=1, max_queue=0, queue_seconds=1)
+
+    async def scenario():
+        await gate.enter("chat", "s1", "client")
+        gate.check("init", "s2", "client")  # the greeting gets through while the slot is taken
+        gate.leave()
+
+    asyncio.run(scenario())
+    assert (gate.active, gate.waiting) == (0, 0)
+
+
+def test_full_queue_is_shed_with_503(limits):
+    gate = ChatAdmission(max_concurrency=1, max_queue=0, queue_seconds=5)
+    before = admissions.value(route="chat", outcome="queue_full")
+
+    async def scenario():
+        await gate.enter("chat", "s1", "client")
+        try:
+            await gate.enter("chat", "s2", "client")
+        finally:
+            gate.leave()
+
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(scenario())
+    assert raised.value.status_code == 503
+    assert raised.value.headers == {"Retry-After": "5"}
+    assert admissions.value(route="chat", outcome="queue_full") == before + 1
+    assert (gate.active, gate.waiting) == (0, 0)
+
+
+def test_queued_request_that_waits_too_long_is_shed_with_503(limits):
+    gate = ChatAdmission(max_concurrency=1, max_queue=1, queue_seconds=0.01)
+    before = admissions.value(route="chat", outcome="queue_timeout")
+
+    async def scenario():
+        await gate.enter("chat", "s1", "client")
+        try:
+            await gate.enter("chat", "s2", "client")
+        finally:
+            gate.leave()
+
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(scenario())
+    assert raised.value.status_code == 503
+    assert admissions.value(route="chat", outcome="queue_timeout") == before + 1
+    assert (gate.active, gate.waiting) == (0, 0)
+
+
+def test_queued_request_gets_the_slot_when_one_is_left(limits):
+    gate = ChatAdmission(max_concurrency=1, max_queue=1, queue_seconds=5)
+
+    async def scenario():
+        await gate.enter("chat", "s1", "client")
+        queued = asyncio.create_task(gate.enter("chat", "s2", "client"))
+        await asyncio.sleep(0)
+        assert gate.waiting == 1
+        gate.leave()
+        await queued
+        assert (gate.active, gate.waiting) == (1, 0)
+        gate.leave()
+
+    asyncio.run(scenario())
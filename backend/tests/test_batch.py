@@ -0,0 +1,43 @@
+# tests/test_batch.py
+import asyncio
+import json
+
+from core import batch
+
+
+def case(i, evidence):
+    return json.dumps({"id": f"case-{i}", "age": 30, "sex": "male", "evidence": evidence})
+
+
+async def collect(lines, concurrency=4):
+    return sorted([result async for result in batch.run_batch(lines, concurrency)], key=lambda r: r.index)
+
+
+def test_unexpected_error_is_reported_per_case(monkeypatch):
+    async def get_diagnosis(age, sex, symptoms, answers=()):
+        if symptoms == ["s_bad"]:
+            raise ValueError("Infermedica returned a non-JSON body")
+        return {"conditions": [{"id": "c_1", "name": "Cold", "common_name": "Cold", "probability": 0.5}]}
+
+    monkeypatch.setattr(batch, "get_diagnosis", get_diagnosis)
+    results = asyncio.run(collect([case(0, ["s_1"]), case(1, ["s_bad"]), case(2, ["s_2"])]))
+
+    assert [r.error is None for r in results] == [True, False, True]
+    assert results[1].error == "Diagnosis failed: ValueError"
+
+
+def test_repeated_cases_share_a_diagnosis_within_the_bound(monkeypatch):
+    calls = []
+
+    async def get_diagnosis(age, sex, symptoms, answers=()):
+        calls.append(symptoms)
+        await asyncio.sleep(0)
+        return {"conditions": []}
+
+    monkeypatch.setattr(batch, "get_diagnosis", get_diagnosis)
+    monkeypatch.setattr(batch, "MAX_SHARED_DIAGNOSES", 3)
+    lines = [case(i, [f"s_{i // 4}"]) for i in range(40)]
+    results = asyncio.run(collect(lines, concurrency=2))
+
+    assert len(results) == 40 and all(r.error is None for r in results)
+    assert calls == [[f"s_{i}"] for i in range(10)]
@@ -0,0 +1,11 @@
+# tests/test_demographics.py
+import pytest
+
+from benchmarks.bench_demographics import CORPUS
+from core.demographics import extract_demographics
+
+
+@pytest.mark.parametrize("text, age, unit, sex", CORPUS)
+def test_extract_demographics(text, age, unit, sex):
+    demographics = extract_demographics(text)
+    assert (demographics.age, demographics.age_unit, demographics.sex) == (age, unit, sex)
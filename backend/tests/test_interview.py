@@ -0,0 +1,82 @@
+# tests/test_interview.py
+import pytest
+
+from core.interview import parse_answer
+from core.sessions import Evidence, Question, QuestionItem
+
+FEVER = Question("single", "Do you have a fever?", [QuestionItem("s_98", "Fever")])
+GROUP_MULTIPLE = Question("group_multiple", "Do you have any of the following?", [
+    QuestionItem("s_21", "Headache"),
+    QuestionItem("s_102", "Cough"),
+    QuestionItem("s_107", "Sore throat"),
+])
+GROUP_SINGLE = Question("group_single", "How long have you had it?", [
+    QuestionItem("s_1", "Less than a day"),
+    QuestionItem("s_2", "Several days"),
+    QuestionItem("s_3", "Over a week"),
+])
+
+
+@pytest.mark.parametrize("text, choice", [
+    ("yes", "present"),
+    ("Yep!", "present"),
+    ("no", "absent"),
+    ("nope, not at all", "absent"),
+    ("I don't know", "unknown"),
+    ("not sure", "unknown"),
+    ("yes, since Monday evening when I got home", "present"),
+    ("I have a fever", "present"),
+    ("I don't have a fever", "absent"),
+])
+def test_single_question_answers(text, choice):
+    assert parse_answer(FEVER, text) == [Evidence("s_98", choice)]
+
+
+@pytest.mark.parametrize("text", [
+    "I have a sore throat too",
+    "I am worried",
+    "all day long",
+    "right side of my head",
+    "sure feels like something is off",
+    "it has been going on for 2 days now",
+])
+def test_single_question_ignores_replies_about_something_else(text):
+    assert parse_answer(FEVER, text) == []
+
+
+def test_group_multiple_by_number_list():
+    assert parse_answer(GROUP_MULTIPLE, "1 and 3") == [
+        Evidence("s_21", "present"), Evidence("s_102", "absent"), Evidence("s_107", "present"),
+    ]
+
+
+def test_group_multiple_by_number_with_negation():
+    assert parse_answer(GROUP_MULTIPLE, "1 and 3 but not 2") == [
+        Evidence("s_21", "present"), Evidence("s_102", "absent"), Evidence("s_107", "present"),
+    ]
+
+
+def test_group_multiple_by_name_with_polarity_per_clause():
+    assert parse_answer(GROUP_MULTIPLE, "yes to the headache, but no cough") == [
+        Evidence("s_21", "present"), Evidence("s_102", "absent"), Evidence("s_107", "absent"),
+    ]
+
+
+def test_group_multiple_none():
+    assert parse_answer(GROUP_MULTIPLE, "none") == [
+        Evidence("s_21", "absent"), Evidence("s_102", "absent"), Evidence("s_107", "absent"),
+    ]
+
+
+@pytest.mark.parametrize("text", ["for 2 days", "I have had it 3 times this week", "all day long"])
+def test_group_multiple_ignores_numbers_and_words_in_passing(text):
+    assert parse_answer(GROUP_MULTIPLE, text) == []
+
+
+def test_group_single_picks_one():
+    assert parse_answer(GROUP_SINGLE, "2") == [Evidence("s_2", "present")]
+    assert parse_answer(GROUP_SINGLE, "over a week I think") == [Evidence("s_3", "present")]
+
+
+def test_group_single_ignores_numbers_in_passing():
+    assert parse_answer(GROUP_SINGLE, "it started 3 days ago") == []
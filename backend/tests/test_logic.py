@@ -0,0 +1,111 @@
+# tests/test_logic.py
+import asyncio
+
+from fastapi import HTTPException
+
+from core import logic
+from core.sessions import session_store
+
+
+def test_failed_turn_can_be_retried(monkeypatch):
+    calls = []
+
+    async def catalog(age):
+        return []
+
+    async def extract_symptoms(session, text):
+        return ["s_21"]
+
+    async def get_diagnosis(age, sex, symptoms, answers=()):
+        calls.append(symptoms)
+        if len(calls) == 1:
+            raise HTTPException(status_code=504, detail="Infermedica request failed")
+        return {"conditions": [{"id": "c_87", "common_name": "Tension-type headache", "probability": 0.6}], "should_stop": True}
+
+    async def get_condition_details(condition_id, age):
+        return {"id": condition_id, "common_name": "Tension-type headache", "severity": "mild",
+                "acuteness": "chronic", "triage_level": "self_care", "hint": None}
+
+    async def summarize_diagnosis(diagnosis_data):
+        yield "It looks like a tension-type headache."
+
+    monkeypatch.setattr(logic.symptom_catalog, "get", catalog)
+    monkeypatch.setattr(logic, "extract_symptoms", extract_symptoms)
+    monkeypatch.setattr(logic, "get_diagnosis", get_diagnosis)
+    monkeypatch.setattr(logic, "get_condition_details", get_condition_details)
+    monkeypatch.setattr(logic, "summarize_diagnosis", summarize_diagnosis)
+
+    async def turn(message):
+        return await logic.process_user_message("retry", message)
+
+    async def main():
+        await turn("")
+        try:
+            await turn("I'm a 30 year old male with a headache")
+        except HTTPException as e:
+            assert e.status_code == 504
+        else:
+            raise AssertionError("the first diagnosis should have failed")
+        assert (await session_store.get("retry")).current_state == "initial_gathering"
+
+        reply = await turn("I'm a 30 year old male with a headache")
+        assert "tension-type headache" in reply
+        session = await session_store.get("retry")
+        assert session.current_state == "follow_up"
+        assert [turn.role for turn in session.chat_history] == ["assistant", "patient", "assistant"]
+
+    asyncio.run(main())
+    assert calls == [["s_21"], ["s_21"]]
+
+
+def test_symptom_reported_alongside_an_interview_answer_is_kept(monkeypatch):
+    catalog = [
+        {"id": "s_21", "name": "Headache", "common_name": "Headache"},
+        {"id": "s_98", "name": "Fever", "common_name": "Fever"},
+        {"id": "s_107", "name": "Sore throat", "common_name": "Sore throat"},
+    ]
+    calls = []
+
+    async def get_catalog(age):
+        return catalog
+
+    async def get_diagnosis(age, sex, symptoms, answers=()):
+        calls.append((list(symptoms), list(answers)))
+        if len(calls) == 1:
+            return {"question": {"type": "single", "text": "Do you have a fever?", "items": [{"id": "s_98", "name": "Fever"}]}}
+        return {"conditions": [], "should_stop": True}
+
+    async def summarize_diagnosis(diagnosis_data):
+        yield "Summary."
+
+    monkeypatch.setattr(logic.symptom_catalog, "get", get_catalog)
+    monkeypatch.setattr(logic, "get_diagnosis", get_diagnosis)
+    monkeypatch.setattr(logic, "summarize_diagnosis", summarize_diagnosis)
+
+    async def main():
+        await logic.process_user_message("alongside", "")
+        assert "fever" in await logic.process_user_message("alongside", "I'm a 30 year old male with a headache")
+        await logic.process_user_message("alongside", "no, but I have a sore throat")
+        session = await session_store.get("alongside")
+        assert [(e.id, e.choice_id, e.name) for e in session.evidence] == [("s_98", "absent", "Fever")]
+
+    asyncio.run(main())
+    symptoms, answers = calls[1]
+    assert symptoms == ["s_21", "s_107"]
+    assert [(a.id, a.choice_id) for a in answers] == [("s_98", "absent")]
+
+
+def test_summary_without_conditions_does_not_fail(monkeypatch):
+    prompts = []
+
+    async def stream_completion(route, messages):
+        prompts.append(messages[-1]["content"])
+        yield "No condition stood out."
+
+    monkeypatch.setattr(logic, "stream_completion", stream_completion)
+
+    async def summary():
+        return "".join([chunk async for chunk in logic.summarize_diagnosis({"conditions": []})])
+
+    assert asyncio.run(summary()) == "No condition stood out."
+    assert prompts == ["The user's top condition: unknown."]
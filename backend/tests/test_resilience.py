@@ -0,0 +1,136 @@
+# tests/test_resilience.py
+import asyncio
+import types
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from config.settings import settings
+from core import resilience
+from core.resilience import CircuitBreaker, Upstream
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(resilience, "time", types.SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(settings, "UPSTREAM_RETRIES", 2)
+    monkeypatch.setattr(settings, "UPSTREAM_RETRY_BASE_SECONDS", 0.0)
+
+
+def failing(outcome, calls):
+    async def send(timeout):
+        calls.append(timeout)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    return send
+
+
+def test_breaker_opens_then_half_opens_then_closes(clock):
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_seconds=30)
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+    assert breaker.retry_after() == 30
+
+    clock[0] += 30
+    assert breaker.allow()
+    assert breaker.state == "half_open"
+    assert not breaker.allow()  # one trial call at a time
+
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.allow() and breaker.allow()
+
+
+def test_failed_trial_call_reopens_the_breaker(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_seconds=30)
+    breaker.record_failure()
+    clock[0] += 30
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert breaker.retry_after() == 30
+
+
+def test_abandoned_trial_call_lets_the_next_one_try(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_seconds=30)
+    breaker.record_failure()
+    clock[0] += 30
+    assert breaker.allow()
+    breaker.abandon()
+    assert breaker.allow()
+
+
+def test_non_idempotent_call_is_not_retried_after_it_may_have_landed():
+    upstream = Upstream("test", 1, CircuitBreaker("test", 10, 30))
+    calls = []
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(upstream.call("endpoint", failing(httpx.ReadError("reset"), calls)))
+    assert raised.value.status_code == 502
+    assert len(calls) == 1
+
+
+def test_idempotent_call_is_retried():
+    upstream = Upstream("test", 1, CircuitBreaker("test", 10, 30))
+    calls = []
+    with pytest.raises(HTTPException):
+        asyncio.run(upstream.call("endpoint", failing(httpx.ReadError("reset"), calls), idempotent=True))
+    assert len(calls) == 3
+    assert upstream.metrics["retries"] == 2
+
+
+def test_rejected_call_is_retried_and_the_last_response_returned():
+    upstream = Upstream("test", 1, CircuitBreaker("test", 10, 30))
+    calls = []
+    response = asyncio.run(upstream.call("endpoint", failing(httpx.Response(503), calls)))
+    assert response.status_code == 503
+    assert len(calls) == 3
+
+
+def test_open_breaker_fails_fast_with_retry_after(clock):
+    upstream = Upstream("test", 1, CircuitBreaker("test", 1, 30))
+    calls = []
+    with pytest.raises(HTTPException):
+        asyncio.run(upstream.call("endpoint", failing(httpx.ReadError("reset"), calls)))
+    clock[0] += 10.5
+
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(upstream.call("endpoint", failing(httpx.Response(200), calls)))
+    assert raised.value.status_code == 503
+    assert raised.value.headers == {"Retry-After": "20"}
+    assert len(calls) == 1
+    assert upstream.metrics["short_circuited"] == 1
+
+
+def test_full_bulkhead_sheds_with_503(monkeypatch):
+    monkeypatch.setattr(settings, "UPSTREAM_QUEUE_SECONDS", 0.01)
+    upstream = Upstream("test", 1, CircuitBreaker("test", 10, 30))
+    release = asyncio.Event()
+
+    async def slow(timeout):
+        await release.wait()
+        return httpx.Response(200)
+
+    async def scenario():
+        first = asyncio.create_task(upstream.call("endpoint", slow))
+        await asyncio.sleep(0)
+        with pytest.raises(HTTPException) as raised:
+            await upstream.call("endpoint", slow)
+        release.set()
+        assert (await first).status_code == 200
+        return raised.value
+
+    error = asyncio.run(scenario())
+    assert error.status_code == 503
+    assert upstream.metrics["shed"] == 1
@@ -0,0 +1,40 @@
+# tests/test_routing.py
+import asyncio
+
+from config.settings import LLMRoute
+from core import logic
+from core.completion_cache import completion_cache, completion_key
+from core.prompts import diagnosis_summary_messages
+from core.routing import ModelRouter, llm_calls, model_router
+
+ROUTES = {"followup": LLMRoute(model="primary", fallback_model="fallback", latency_slo_seconds=1.0)}
+
+
+def test_one_slow_call_does_not_trip_the_fallback():
+    router = ModelRouter(ROUTES, window=20, fallback_seconds=60)
+    router.observe(router.route("followup"), 10.0)
+    for _ in range(19):
+        router.observe(router.route("followup"), 0.1)
+    assert router.route("followup").model == "primary"
+
+
+def test_slow_p90_over_a_full_window_trips_the_fallback():
+    router = ModelRouter(ROUTES, window=20, fallback_seconds=60)
+    for i in range(20):
+        assert router.route("followup").model == "primary"
+        router.observe(router.route("followup"), 5.0 if i % 5 == 0 else 0.1)
+    route = router.route("followup")
+    assert (route.model, route.fallback) == ("fallback", True)
+
+
+def test_cached_summary_is_not_counted_as_a_call():
+    condition = {"id": "c_87", "name": "Tension-type headache", "common_name": "Tension-type headache", "probability": 0.6}
+    route = model_router.route("diagnosis_summary")
+    completion_cache.set(completion_key(route.model, diagnosis_summary_messages(condition)), "Cached summary.")
+    before = llm_calls.value(task="diagnosis_summary", model=route.model, route="primary")
+
+    async def summary():
+        return "".join([chunk async for chunk in logic.summarize_diagnosis({"conditions": [condition]})])
+
+    assert asyncio.run(summary()) == "Cached summary."
+    assert llm_calls.value(task="diagnosis_summary", model=route.model, route="primary") == before
@@ -0,0 +1,49 @@
+# tests/test_sessions.py
+import asyncio
+
+import pytest
+
+from core.sessions import MemorySessionStore, Session, SessionStore, SQLiteSessionStore
+
+
+def test_incomplete_store_fails_when_created():
+    class GetOnlyStore(SessionStore):
+        async def get(self, session_id):
+            return None
+
+    with pytest.raises(TypeError):
+        GetOnlyStore(ttl_seconds=60, max_entries=10)
+
+
+def test_sqlite_store_never_serves_an_expired_session(tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.db"), ttl_seconds=0, max_entries=10)
+
+    async def main():
+        await store.save("a", Session(age=30))
+        return await store.get("a")
+
+    assert asyncio.run(main()) is None
+    assert store.metrics["expirations"] == 1
+
+
+def test_sqlite_store_sweep_enforces_max_entries(tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.db"), ttl_seconds=60, max_entries=3)
+
+    async def main():
+        for i in range(5):
+            await store.save(str(i), Session(age=20 + i))
+        await store.purge()
+        return [await store.get(str(i)) is not None for i in range(5)]
+
+    assert asyncio.run(main()) == [False, False, True, True, True]
+    assert len(store) == 3
+
+
+def test_stores_hand_out_copies(tmp_path):
+    async def roundtrip(store):
+        await store.save("a", Session(age=30))
+        (await store.get("a")).age = 99
+        return (await store.get("a")).age
+
+    assert asyncio.run(roundtrip(MemorySessionStore(ttl_seconds=60, max_entries=10))) == 30
+    assert asyncio.run(roundtrip(SQLiteSessionStore(str(tmp_path / "sessions.db"), ttl_seconds=60, max_entries=10))) == 30
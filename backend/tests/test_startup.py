@@ -0,0 +1,17 @@
+# tests/test_startup.py
+import json
+import os
+import subprocess
+import sys
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Imported on first use, never by a worker starting up.
+DEFERRED = ["openai", "numpy", "sklearn"]
+
+
+def test_importing_main_leaves_heavy_dependencies_unloaded():
+    probe = f"import json, sys; import main; print(json.dumps([m for m in {DEFERRED!r} if m in sys.modules]))"
+    result = subprocess.run([sys.executable, "-c", probe], cwd=BACKEND, env=os.environ.copy(),
+                            capture_output=True, text=True, check=True)
+    assert json.loads(result.stdout.splitlines()[-1]) == []
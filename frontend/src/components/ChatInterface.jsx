@@ -104,7 +104,7 @@ export default function ChatInterface() {
     setIsTyping(true);
 
     try {
-      const response = await fetch('http://localhost:8001/api/chat', {
+      const response = await fetch('http://localhost:8001/api/chat/stream', {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -117,19 +117,55 @@ export default function ChatInterface() {
         throw new Error(`HTTP error! status: ${response.status}`);
       }
 
-      const data = await response.json(); // { response: "..." }
-      
-      // Add assistant's text response
-      setMessages((prev) => [
-        ...prev,
-        {
-          id: Date.now().toString(),
-          content: data.response,
-          sender: 'assistant',
-          timestamp: new Date(),
-          type: 'text',
-        },
-      ]);
+      // The reply arrives as newline-delimited JSON: { token } frames while it
+      // is generated, then a final { response } (or { error }) frame.
+      const assistantId = `${Date.now()}-assistant`;
+      let assistantText = '';
+      const showAssistantText = (text) => {
+        setMessages((prev) => {
+          const existing = prev.find((message) => message.id === assistantId);
+          if (existing) {
+            return prev.map((message) => (message.id === assistantId ? { ...message, content: text } : message));
+          }
+          return [
+            ...prev,
+            {
+              id: assistantId,
+              content: text,
+              sender: 'assistant',
+              timestamp: new Date(),
+              type: 'text',
+            },
+          ];
+        });
+      };
+
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffered = '';
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffered += decoder.decode(value, { stream: true });
+
+        const lines = buffered.split('\n');
+        buffered = lines.pop();
+        for (const line of lines) {
+          if (!line.trim()) continue;
+          const frame = JSON.parse(line);
+          if (frame.error) {
+            throw new Error(frame.error);
+          }
+          if (frame.token !== undefined) {
+            assistantText += frame.token;
+          } else if (frame.response !== undefined) {
+            assistantText = frame.response;
+          }
+          // Hide the typing indicator as soon as the first words show up
+          setIsTyping(false);
+          showAssistantText(assistantText);
+        }
+      }
       
     } catch (error) {
       console.error('Error sending message:', error);